@@ -1,3 +1,233 @@
+# admin.py
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.forms import BaseUserCreationForm, UserChangeForm as BaseUserChangeForm
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-# Register your models here.
+from . import purge
+from .events import record_events
+from .models import Crm, DataStore, Invoice, ServiceItem, User
+from .readplans import ReadPlan
+from .serializers import CrmSerializer, InvoiceSerializer
+
+# Below this many rows the planner's estimate is too rough to show, and an
+# exact COUNT(*) is cheap anyway.
+ADMIN_EXACT_COUNT_BELOW = 10000
+
+
+def estimated_count(queryset):
+    """The database's own row estimate for the queryset's table, or None."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # An upper bound (deleted rows leave gaps), read off the end of the rowid b-tree.
+            cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator for big tables: an unfiltered changelist takes its
+    count from the table statistics instead of COUNT(*). Searches and filters
+    still count exactly, since they are bounded by an index.
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= ADMIN_EXACT_COUNT_BELOW:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelists that stay fast at millions of rows: estimated counts, no
+    second count for "N total", newest first by primary key (always indexed)
+    and searches that are exact matches on indexed columns only.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    # Foreign key holding the row's owner; searching for an email matches
+    # rows owned by that user.
+    owner_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        # No icontains: every branch is an index lookup, and the owner is
+        # resolved with a subquery rather than a join so the OR stays cheap.
+        query = Q.create([(field, term) for field in self.get_search_fields(request)], connector=Q.OR)
+        if self.owner_field:
+            query |= Q(**{f"{self.owner_field}__in": User.objects.filter(email=term).values('pk')})
+        return queryset.filter(query), False
+
+
+class OutboxAdmin(admin.ModelAdmin):
+    """
+    Admin writes emit the same outbox events as the API, in the same
+    transaction, so webhook consumers and the event feed see them too.
+    """
+    # Event type prefix, serializer for the payload and the owner's column.
+    event_prefix = None
+    event_serializer = None
+    owner_attname = None
+
+    def save_related(self, request, form, formsets, change):
+        # Runs after save_model and the inlines, so the payload is complete,
+        # and inside the transaction changeform_view opens around both.
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        payload = self.event_serializer(obj, context={'request': request}).data
+        event_type = f"{self.event_prefix}.{'updated' if change else 'created'}"
+        record_events(event_type, self.model, [(getattr(obj, self.owner_attname), obj.pk, payload)])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            record_events(f"{self.event_prefix}.deleted", self.model,
+                          [(getattr(obj, self.owner_attname), obj.pk, {'id': obj.pk})])
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            owners = queryset.values_list('pk', self.owner_attname)
+            record_events(f"{self.event_prefix}.deleted", self.model,
+                          [(owner_id, pk, {'id': pk}) for pk, owner_id in owners])
+            super().delete_queryset(request, queryset)
+
+
+class UserCreationForm(BaseUserCreationForm):
+    class Meta(BaseUserCreationForm.Meta):
+        model = User
+        fields = ('email', 'username')
+
+
+class UserChangeForm(BaseUserChangeForm):
+    class Meta(BaseUserChangeForm.Meta):
+        model = User
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
+    form = UserChangeForm
+    add_form = UserCreationForm
+    list_display = ('id', 'email', 'username', 'role', 'is_staff', 'is_active', 'created_at')
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    search_fields = ('email',)
+    search_help_text = "Exact email address."
+    readonly_fields = ('last_login', 'date_joined', 'created_at', 'updated_at', 'avatar_renditions', 'share_key_version')
+    fieldsets = (
+        (None, {'fields': ('email', 'password')}),
+        ('Profile', {'fields': ('username', 'first_name', 'last_name', 'phone_number', 'role', 'location',
+                                'profile_photo', 'avatar_renditions')}),
+        ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
+        ('Dates', {'fields': ('last_login', 'date_joined', 'created_at', 'updated_at')}),
+        ('Sharing', {'fields': ('share_key_version',)}),
+    )
+    add_fieldsets = (
+        (None, {'classes': ('wide',), 'fields': ('email', 'username', 'password1', 'password2')}),
+    )
+
+
+@admin.register(Crm)
+class CrmAdmin(OutboxAdmin, LargeTableAdmin):
+    list_display = ('id', 'full_name', 'email_address', 'user', 'event_type', 'status', 'created_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('email_address',)
+    search_help_text = "Exact client or owner email address."
+    owner_field = 'user'
+    event_prefix = 'crm'
+    event_serializer = CrmSerializer
+    owner_attname = 'user_id'
+
+
+class ServiceItemInline(admin.TabularInline):
+    model = ServiceItem
+    fields = ('name', 'cost', 'quantity', 'total')
+    readonly_fields = ('total',)
+    extra = 0
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(OutboxAdmin, LargeTableAdmin):
+    list_display = ('id', 'invoice_number', 'customer_name', 'created_by', 'date', 'total_amount', 'status')
+    list_select_related = ('created_by',)
+    list_filter = ('status',)
+    raw_id_fields = ('created_by',)
+    search_fields = ('invoice_number',)
+    search_help_text = "Exact invoice number or owner email address."
+    owner_field = 'created_by'
+    inlines = (ServiceItemInline,)
+    actions = ('mark_paid',)
+    read_plan = ReadPlan(InvoiceSerializer)
+    event_prefix = 'invoice'
+    event_serializer = InvoiceSerializer
+    owner_attname = 'created_by_id'
+
+    @admin.action(description="Mark selected invoices as paid")
+    def mark_paid(self, request, queryset):
+        with transaction.atomic():
+            owners = dict(queryset.exclude(status='paid').select_for_update().values_list('pk', 'created_by_id'))
+            # One UPDATE for the lot. The invoice.paid events carry the same
+            # InvoiceSerializer payload as InvoiceViewSet.mark_as_paid and go
+            # out in one INSERT.
+            paid = Invoice.objects.filter(pk__in=owners)
+            paid.update(status='paid', updated_at=timezone.now())
+            record_events('invoice.paid', Invoice, [
+                (owners[data['id']], data['id'], data)
+                for data in self.read_plan.serialize(paid, {'request': request})
+            ])
+        self.message_user(request, f"Marked {len(owners)} invoice(s) as paid.")
+
+
+@admin.register(DataStore)
+class DataStoreAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'user', 'file_type', 'size', 'storage_tier', 'uploaded_at', 'deleted_at')
+    list_select_related = ('user',)
+    list_filter = ('file_type', 'storage_tier', ('deleted_at', admin.EmptyFieldListFilter))
+    raw_id_fields = ('user',)
+    search_fields = ('checksum',)
+    search_help_text = "Exact SHA-256 checksum or owner email address."
+    owner_field = 'user'
+    readonly_fields = ('file', 'file_type', 'file_format', 'size', 'checksum', 'uploaded_at', 'updated_at',
+                       'storage_tier', 'cold_name', 'last_accessed_at', 'deleted_at')
+    actions = ('purge_files',)
+
+    def get_queryset(self, request):
+        # Soft-deleted rows stay visible until api.purge has removed them.
+        return DataStore.all_objects.all()
+
+    def has_add_permission(self, request):
+        # Files arrive through the upload API, which checksums and sniffs them.
+        return False
+
+    def get_actions(self, request):
+        # delete_selected would hard-delete row by row; purge_files is the
+        # bulk equivalent that goes through api.purge.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(description="Purge selected files", permissions=['delete'])
+    def purge_files(self, request, queryset):
+        hidden = purge.soft_delete_many(queryset)
+        self.message_user(request, f"Purging {hidden} file(s); storage is reclaimed in the background.")
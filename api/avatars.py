@@ -0,0 +1,97 @@
+# avatars.py
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import purge
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = getattr(settings, 'AVATAR_SIZES', (64, 128, 256))
+AVATAR_WORKERS = getattr(settings, 'AVATAR_WORKERS', 2)
+AVATAR_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+_executor = ThreadPoolExecutor(max_workers=AVATAR_WORKERS, thread_name_prefix='avatars')
+
+
+def rendition_name(user_id, prefix, size, ext):
+    # A fresh prefix per run: URLs change with the photo, so caches never
+    # serve a stale avatar, and nothing being served is ever overwritten.
+    return f"profile/avatars/{user_id}/{prefix}_{size}.{ext}"
+
+
+def build_renditions(fileobj, sizes=AVATAR_SIZES):
+    """
+    Return {size: {ext: bytes}} of square, metadata-free renditions.
+    Pillow is imported lazily so the API process does not pay for it at startup.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(fileobj) as image:
+        # Let the JPEG decoder downscale while decoding; far cheaper than a full decode.
+        image.draft('RGB', (max(sizes) * 2, max(sizes) * 2))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    renditions = {}
+    for size in sizes:
+        # fit() centre-crops to the target aspect ratio before resizing.
+        square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        renditions[size] = {}
+        for ext, (fmt, options) in AVATAR_FORMATS.items():
+            buffer = BytesIO()
+            # Nothing from the original (EXIF, GPS, ICC) is passed on to save().
+            square.save(buffer, fmt, **options)
+            renditions[size][ext] = buffer.getvalue()
+    return renditions
+
+
+def process_avatar(user_id):
+    user = User.objects.filter(pk=user_id).only('id', 'profile_photo').first()
+    if user is None or not user.profile_photo:
+        return
+    source = user.profile_photo.name
+
+    with user.profile_photo.open('rb') as fileobj:
+        renditions = build_renditions(fileobj)
+
+    prefix = uuid.uuid4().hex[:8]
+    names = {}
+    for size, files in renditions.items():
+        names[str(size)] = {}
+        for ext, content in files.items():
+            names[str(size)][ext] = default_storage.save(rendition_name(user_id, prefix, size, ext), ContentFile(content))
+
+    with transaction.atomic():
+        previous = User.objects.select_for_update().filter(pk=user_id).values_list('avatar_renditions', flat=True).first()
+        # Only publish if the photo was not replaced while we were working;
+        # bumping updated_at invalidates the cached user payload.
+        published = User.objects.filter(pk=user_id, profile_photo=source).update(
+            avatar_renditions=names, updated_at=timezone.now()
+        )
+    stale = previous if published else names
+    purge.remove_blobs([name for files in (stale or {}).values() for name in files.values()])
+
+
+def _run(user_id):
+    try:
+        process_avatar(user_id)
+    except Exception:
+        logger.exception("Avatar processing failed for user %s", user_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_avatar_processing(user_id):
+    """Process the avatar on a background thread once the current transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_run, user_id))
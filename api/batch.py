@@ -0,0 +1,114 @@
+# batch.py
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+# Threads shared by all batches for parallel reads. Each holds its own
+# database connection while it runs, so keep this within the pool size.
+BATCH_WORKERS = getattr(settings, 'BATCH_WORKERS', 4)
+BATCH_PATH_PREFIX = '/api/'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+# Outer request headers that describe the batch body, not a sub-request.
+_BODY_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_CONTENT_ENCODING', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MATCH')
+
+
+class BatchAuthentication(BaseAuthentication):
+    """
+    Authenticates a batch entry as the batch it came in. The batch view has
+    already authenticated the caller, and sub_request() records the result on
+    the entry's WSGIRequest, where no client input can reach it. Plain
+    requests never carry it, so this falls through to the other classes.
+    """
+
+    def authenticate(self, request):
+        return getattr(request._request, 'batch_auth', None)
+
+    def authenticate_header(self, request):
+        # DRF takes the challenge from the first class; keep the 401s that
+        # TokenAuthentication gives unauthenticated requests.
+        return TokenAuthentication.keyword
+
+
+def sub_request(request, item):
+    """
+    A WSGIRequest for one batch entry, sharing the batch's headers and
+    carrying its already authenticated user for BatchAuthentication.
+    """
+    url = urlsplit(item['path'])
+    body = json.dumps(item['body']).encode() if item.get('body') is not None else b''
+    environ = {key: value for key, value in request.META.items() if key not in _BODY_META}
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'wsgi.input': io.BytesIO(body),
+    })
+    if body:
+        environ.update({'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body))})
+    sub = WSGIRequest(environ)
+    sub.batch_auth = (request.user, request.auth)
+    return sub
+
+
+def dispatch(request, item, excluded_views=()):
+    """{'status', 'headers', 'body'} for one batch entry, run through the URLconf."""
+    path = urlsplit(item['path']).path
+    try:
+        if not path.startswith(BATCH_PATH_PREFIX):
+            raise Resolver404
+        match = resolve(path)
+    except Resolver404:
+        return {'status': 404, 'headers': {}, 'body': {'error': 'Not found.'}}
+    if getattr(match.func, 'cls', None) in excluded_views:
+        return {'status': 400, 'headers': {}, 'body': {'error': 'This endpoint cannot be batched.'}}
+
+    try:
+        response = match.func(sub_request(request, item), *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batched %s %s failed", item['method'], item['path'])
+        return {'status': 500, 'headers': {}, 'body': {'error': 'Internal server error.'}}
+
+    try:
+        if response.streaming:
+            return {'status': 400, 'headers': {}, 'body': {'error': 'Streaming responses cannot be batched.'}}
+        # DRF responses are returned unrendered: their data is rendered once,
+        # together with the rest of the batch.
+        body = response.data if isinstance(response, Response) else None
+        headers = {key: value for key, value in response.items() if key != 'Content-Type'}
+        return {'status': response.status_code, 'headers': headers, 'body': body}
+    finally:
+        response.close()
+
+
+def _dispatch_in_thread(request, item, excluded_views):
+    try:
+        return dispatch(request, item, excluded_views)
+    finally:
+        close_old_connections()
+
+
+def run(request, items, parallel=False, excluded_views=()):
+    """
+    Dispatch every entry and return the results in order. Entries run one
+    after another, so later ones see earlier writes; with ``parallel`` a batch
+    made only of reads is spread over the thread pool instead.
+    """
+    if parallel and len(items) > 1 and all(item['method'] in SAFE_METHODS for item in items):
+        futures = [_executor.submit(_dispatch_in_thread, request, item, excluded_views) for item in items]
+        return [future.result() for future in futures]
+    return [dispatch(request, item, excluded_views) for item in items]
@@ -0,0 +1,213 @@
+# events.py
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import OutboxEvent, Webhook
+
+WEBHOOK_BATCH_SIZE = getattr(settings, 'WEBHOOK_BATCH_SIZE', 100)
+WEBHOOK_TIMEOUT = getattr(settings, 'WEBHOOK_TIMEOUT', 10)
+WEBHOOK_MAX_BACKOFF = getattr(settings, 'WEBHOOK_MAX_BACKOFF', 3600)
+# How long a worker owns a webhook once it has claimed it. Must outlive a
+# POST; a worker that dies mid-delivery releases the webhook when it lapses.
+WEBHOOK_LEASE_SECONDS = getattr(settings, 'WEBHOOK_LEASE_SECONDS', WEBHOOK_TIMEOUT * 3)
+# Endpoints delivered to concurrently, so one slow endpoint does not hold up
+# the others.
+WEBHOOK_WORKERS = getattr(settings, 'WEBHOOK_WORKERS', 4)
+# Events younger than this are held back: ids are allocated before commit, so a
+# slow transaction could otherwise commit an id below a cursor already handed out.
+EVENT_SETTLE_SECONDS = getattr(settings, 'EVENT_SETTLE_SECONDS', 2)
+
+
+def record_event(user, event_type, instance, payload=None):
+    """
+    Append an event to the outbox. Must be called inside the transaction that
+    performs the write, so the event is committed (or rolled back) with it.
+    """
+    if payload is None:
+        payload = {'id': instance.pk}
+    return OutboxEvent.objects.create(
+        user=user,
+        event_type=event_type,
+        object_type=instance._meta.model_name,
+        object_id=instance.pk,
+        # Round-trip through the encoder so Decimals/dates are stored as JSON.
+        payload=json.loads(json.dumps(payload, cls=DjangoJSONEncoder)),
+    )
+
+
+def record_events(event_type, model, events):
+    """
+    record_event for many objects in one INSERT. ``events`` is a list of
+    (user_id, object_id, payload); same transaction rule as record_event.
+    """
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            user_id=user_id,
+            event_type=event_type,
+            object_type=model._meta.model_name,
+            object_id=object_id,
+            payload=json.loads(json.dumps(payload, cls=DjangoJSONEncoder)),
+        )
+        for user_id, object_id, payload in events
+    ])
+
+
+def settled_events(user_id, since=0):
+    cutoff = timezone.now() - timedelta(seconds=EVENT_SETTLE_SECONDS)
+    return OutboxEvent.objects.filter(
+        user_id=user_id, id__gt=since, created_at__lte=cutoff
+    ).order_by('id')
+
+
+def serialize_event(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'object_type': event.object_type,
+        'object_id': event.object_id,
+        'data': event.payload,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+def sign_payload(secret, timestamp, body):
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class UnsafeWebhookURL(ValueError):
+    pass
+
+
+def check_webhook_url(url):
+    """
+    Raise UnsafeWebhookURL unless ``url`` is https and its host resolves only
+    to public addresses, so the worker cannot be pointed at loopback,
+    link-local (cloud metadata) or private network services.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != 'https' or not parts.hostname:
+        raise UnsafeWebhookURL("Webhook URLs must use https.")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443)}
+    except (socket.gaierror, UnicodeError):
+        raise UnsafeWebhookURL("Webhook host does not resolve.")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if not ip.is_global:
+            raise UnsafeWebhookURL("Webhook host must resolve to a public address.")
+
+
+class _NoRedirects(urllib.request.HTTPRedirectHandler):
+    # A redirect could lead past check_webhook_url; treat it as a failure.
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirects)
+
+
+def post_batch(webhook, events):
+    # Checked again at delivery: the host may resolve differently by now.
+    check_webhook_url(webhook.url)
+    body = json.dumps({'events': [serialize_event(e) for e in events]}).encode()
+    timestamp = str(int(time.time()))
+    request = urllib.request.Request(
+        webhook.url,
+        data=body,
+        method='POST',
+        headers={
+            'Content-Type': 'application/json',
+            'X-Webhook-Timestamp': timestamp,
+            'X-Webhook-Signature': f"sha256={sign_payload(webhook.secret, timestamp, body)}",
+        },
+    )
+    with _opener.open(request, timeout=WEBHOOK_TIMEOUT) as response:
+        return 200 <= response.status < 300
+
+
+def claim_webhook(webhook):
+    """
+    Take a lease on a due webhook with a compare-and-swap on next_attempt_at,
+    so no lock is held while its batch is POSTed. Returns the lease expiry,
+    or None if another worker got there first.
+    """
+    lease_until = timezone.now() + timedelta(seconds=WEBHOOK_LEASE_SECONDS)
+    claimed = Webhook.objects.filter(
+        pk=webhook.pk, is_active=True, next_attempt_at=webhook.next_attempt_at,
+    ).update(next_attempt_at=lease_until)
+    return lease_until if claimed else None
+
+
+def deliver_webhook(webhook, lease_until):
+    """
+    Send the next batch of pending events to a webhook claimed with
+    claim_webhook. Returns the number of events delivered.
+    """
+    # Only the lease holder records the outcome; a worker whose lease lapsed
+    # mid-POST leaves the webhook to whoever claimed it next.
+    leased = Webhook.objects.filter(pk=webhook.pk, next_attempt_at=lease_until)
+    events = list(settled_events(webhook.user_id, webhook.last_event_id)[:WEBHOOK_BATCH_SIZE])
+    if not events:
+        leased.update(next_attempt_at=timezone.now())
+        return 0
+
+    try:
+        delivered = post_batch(webhook, events)
+    except (urllib.error.URLError, OSError, ValueError):
+        delivered = False
+
+    if delivered:
+        leased.update(
+            last_event_id=events[-1].id,
+            failure_count=0,
+            next_attempt_at=timezone.now(),
+        )
+        return len(events)
+
+    # Exponential backoff, capped so a dead endpoint is still retried hourly.
+    failures = webhook.failure_count + 1
+    delay = min(2 ** failures, WEBHOOK_MAX_BACKOFF)
+    leased.update(
+        failure_count=failures,
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+    )
+    return 0
+
+
+def _deliver_in_thread(webhook):
+    try:
+        lease_until = claim_webhook(webhook)
+        return deliver_webhook(webhook, lease_until) if lease_until else 0
+    finally:
+        close_old_connections()
+
+
+def deliver_pending(workers=WEBHOOK_WORKERS):
+    """Run one delivery pass over every webhook that is due."""
+    due = list(Webhook.objects.filter(is_active=True, next_attempt_at__lte=timezone.now()))
+    if workers <= 1 or len(due) <= 1:
+        total = 0
+        for webhook in due:
+            lease_until = claim_webhook(webhook)
+            if lease_until:
+                total += deliver_webhook(webhook, lease_until)
+        return total
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhooks') as executor:
+        return sum(executor.map(_deliver_in_thread, due))
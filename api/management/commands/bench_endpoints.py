@@ -0,0 +1,167 @@
+import json
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.seed_data import SEED_EMAIL_PREFIX
+from api.models import User
+from api.urls import router
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def discover_endpoints():
+    """
+    GET endpoints exposed by the router: list routes, list-level actions, and
+    detail routes/actions (marked with ``{pk}``). Actions with extra URL
+    arguments are skipped since there is nothing sensible to fill them with.
+    """
+    endpoints = ['/api/sync/']
+    for prefix, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            endpoints.append(f"/api/{prefix}/")
+        if hasattr(viewset, 'retrieve'):
+            endpoints.append(f"/api/{prefix}/{{pk}}/")
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping or '(?P<' in extra.url_path:
+                continue
+            if extra.detail:
+                endpoints.append(f"/api/{prefix}/{{pk}}/{extra.url_path}/")
+            else:
+                endpoints.append(f"/api/{prefix}/{extra.url_path}/")
+    return endpoints
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every GET router endpoint with concurrent authenticated clients in-process and "
+        "report p50/p95/p99 latency, throughput and query counts. Run seed_data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=4, help="Concurrent clients (one seeded user each).")
+        parser.add_argument('--requests', type=int, default=20, help="Requests per client per endpoint.")
+        parser.add_argument('--endpoint', action='append', help="Only run endpoints containing this string.")
+        parser.add_argument('--save', help="Write results to this JSON baseline file.")
+        parser.add_argument('--compare', help="Compare against a JSON baseline and fail on regressions.")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Allowed relative p95 slowdown before flagging a regression.")
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        users = list(User.objects.filter(email__startswith=SEED_EMAIL_PREFIX).order_by('pk')[:options['clients']])
+        if not users:
+            raise CommandError("No seeded users found; run `manage.py seed_data` first.")
+        tokens = [Token.objects.get_or_create(user=user)[0].key for user in users]
+
+        endpoints = discover_endpoints()
+        if options['endpoint']:
+            endpoints = [e for e in endpoints if any(f in e for f in options['endpoint'])]
+
+        results = {}
+        for endpoint in endpoints:
+            result = self.run_endpoint(endpoint, users, tokens, options['requests'])
+            if result is None:
+                self.stdout.write(f"{endpoint:<45} skipped: no objects to fetch")
+                continue
+            results[endpoint] = result
+            self.print_result(endpoint, result)
+
+        if options['save']:
+            with open(options['save'], 'w') as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def run_endpoint(self, template, users, tokens, count):
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            started = time.perf_counter()
+            samples = list(pool.map(
+                lambda args: self.client_loop(template, *args, count), zip(users, tokens)
+            ))
+            wall = time.perf_counter() - started
+
+        samples = [sample for sample in samples if sample is not None]
+        if not samples:
+            return None
+        timings = sorted(t for sample in samples for t in sample['timings'])
+        queries = [q for sample in samples for q in sample['queries']]
+        errors = sum(sample['errors'] for sample in samples)
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'throughput_rps': round(len(timings) / wall, 1),
+            'queries': round(statistics.mean(queries), 1),
+        }
+
+    def client_loop(self, template, user, token, count):
+        client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f"Token {token}")
+        path = template
+        if '{pk}' in template:
+            pk = self.detail_pk(client, template, user)
+            if pk is None:
+                close_old_connections()
+                return None
+            path = template.replace('{pk}', str(pk))
+        timings, queries, errors = [], [], 0
+        try:
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = client.get(path)
+                    if getattr(response, 'streaming', False):
+                        b''.join(response.streaming_content)
+                    timings.append(time.perf_counter() - start)
+                queries.append(len(captured))
+                errors += response.status_code >= 400
+        finally:
+            close_old_connections()
+        return {'timings': timings, 'queries': queries, 'errors': errors}
+
+    def detail_pk(self, client, template, user):
+        list_path = template.split('{pk}')[0]
+        if list_path == '/api/users/':
+            return user.pk
+        data = client.get(list_path).json()
+        if isinstance(data, list) and data:
+            return data[0]['id']
+        return None
+
+    def print_result(self, endpoint, r):
+        self.stdout.write(
+            f"{endpoint:<45} p50={r['p50_ms']:8.2f} p95={r['p95_ms']:8.2f} p99={r['p99_ms']:8.2f} ms "
+            f"{r['throughput_rps']:8.1f} req/s queries={r['queries']:5.1f} errors={r['errors']}"
+        )
+
+    def compare(self, results, path, threshold):
+        with open(path) as fh:
+            baseline = json.load(fh)
+        regressions = []
+        for endpoint, current in results.items():
+            previous = baseline.get(endpoint)
+            if previous is None:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+                regressions.append(f"{endpoint}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+            if current['queries'] > previous['queries']:
+                regressions.append(f"{endpoint}: queries {previous['queries']} -> {current['queries']}")
+        if regressions:
+            for line in regressions:
+                self.stderr.write(f"REGRESSION {line}")
+            raise CommandError(f"{len(regressions)} regression(s) against {path}")
+        self.stdout.write(f"No regressions against {path}")
@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a fresh WSGI worker does before it can serve its first request.
+STARTUP_SCRIPT = (
+    "from django.core.wsgi import get_wsgi_application\n"
+    "application = get_wsgi_application()\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+# Modules an API worker should only import on first use. (django.core.mail
+# and parts of the admin are pulled in by Django's logging and DRF's schema
+# generator regardless, so they are not listed.)
+DEFERRED_MODULES = [
+    'PIL.Image', 'smtplib', 'django.contrib.sessions.backends.base', 'django.contrib.messages.middleware',
+]
+
+
+def parse_importtime(stderr):
+    """[(module, self_us)] from ``python -X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure cold-start import cost of a WSGI worker with `python -X importtime`, report the "
+        "heaviest packages and deferred modules that leaked in, and compare against a baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', default=os.environ.get('DJANGO_SETTINGS_MODULE'),
+                            help="Settings to start the worker with (e.g. backend.settings_api).")
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to start; the median is reported.")
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--save', help="Write results to this JSON baseline file.")
+        parser.add_argument('--compare', help="Compare against a JSON baseline and fail on regressions.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed relative slowdown of import time before flagging a regression.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': options['settings_module'], 'PYTHONDONTWRITEBYTECODE': '1'}
+        runs = [self.run_once(env) for _ in range(max(1, options['runs']))]
+        rows = runs[len(runs) // 2][1]
+        imported = {name for name, _ in rows}
+
+        by_package = defaultdict(int)
+        for name, self_us in rows:
+            by_package[name.split('.')[0]] += self_us
+        leaked = sorted(m for m in DEFERRED_MODULES if m in imported)
+
+        result = {
+            'settings': options['settings_module'],
+            'startup_ms': round(statistics.median(wall for wall, _ in runs), 1),
+            'import_ms': round(statistics.median(sum(r[1] for r in rows) for _, rows in runs) / 1000, 1),
+            'modules': len(imported),
+            'deferred_modules_imported': leaked,
+        }
+
+        self.stdout.write(
+            f"{result['settings']}: start-up {result['startup_ms']} ms wall, "
+            f"{result['import_ms']} ms importing {result['modules']} modules (median of {len(runs)})"
+        )
+        self.stdout.write(f"{'package':<30} {'self ms':>9}")
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"{package:<30} {self_us / 1000:9.1f}")
+        self.stdout.write(f"Deferred modules imported at start-up: {', '.join(leaked) or 'none'}")
+
+        if options['save']:
+            with open(options['save'], 'w') as fh:
+                json.dump(result, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+
+        if options['compare']:
+            self.compare(result, options['compare'], options['threshold'])
+
+    def run_once(self, env):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = (time.perf_counter() - started) * 1000
+        if completed.returncode:
+            raise CommandError(f"Worker start-up failed:\n{completed.stderr[-2000:]}")
+        return wall, parse_importtime(completed.stderr)
+
+    def compare(self, result, path, threshold):
+        with open(path) as fh:
+            baseline = json.load(fh)
+        regressions = []
+        if result['import_ms'] > baseline['import_ms'] * (1 + threshold):
+            regressions.append(f"import time {baseline['import_ms']} -> {result['import_ms']} ms")
+        if result['modules'] > baseline['modules'] * (1 + threshold):
+            regressions.append(f"modules {baseline['modules']} -> {result['modules']}")
+        new_leaks = sorted(set(result['deferred_modules_imported']) - set(baseline['deferred_modules_imported']))
+        if new_leaks:
+            regressions.append(f"now imported at start-up: {', '.join(new_leaks)}")
+        if regressions:
+            for line in regressions:
+                self.stderr.write(f"REGRESSION {line}")
+            raise CommandError(f"{len(regressions)} regression(s) against {path}")
+        self.stdout.write(f"No regressions against {path}")
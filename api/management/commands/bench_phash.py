@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.phash import MultiIndexHash, hamming
+
+
+class Command(BaseCommand):
+    help = "Benchmark multi-index Hamming search against a linear scan on synthetic 64-bit hashes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashes', type=int, default=500000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--distance', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        distance = options['distance']
+        hashes = [rng.getrandbits(64) for _ in range(options['hashes'])]
+
+        # Each query is a perturbed copy of a stored hash, like a re-exported photo.
+        queries = []
+        for _ in range(options['queries']):
+            value = rng.choice(hashes)
+            for bit in rng.sample(range(64), rng.randint(0, distance)):
+                value ^= 1 << bit
+            queries.append(value)
+
+        start = time.perf_counter()
+        index = MultiIndexHash(enumerate(hashes))
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [sorted(index.search(q, distance)) for q in queries]
+        indexed_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        linear = [
+            sorted((key, d) for key, d in ((k, hamming(q, h)) for k, h in enumerate(hashes)) if d <= distance)
+            for q in queries
+        ]
+        linear_time = time.perf_counter() - start
+
+        if indexed != linear:
+            raise CommandError("Multi-index results differ from the linear scan")
+
+        n = len(queries)
+        self.stdout.write(f"hashes={len(hashes)} queries={n} distance={distance} build={build:.2f}s")
+        self.stdout.write(f"linear scan  {linear_time / n * 1000:9.3f} ms/query")
+        self.stdout.write(f"multi-index  {indexed_time / n * 1000:9.3f} ms/query "
+                          f"({linear_time / indexed_time:.0f}x faster)")
@@ -0,0 +1,84 @@
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from api.models import DataStore, Invoice, ServiceItem, User
+from api.readplans import ReadPlan
+from api.serializers import DataStoreSerializer, InvoiceSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare ReadPlan list serialization with the DRF serializers (data is rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--services', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rows = options['rows']
+        user = User.objects.create_user(email='bench-readplans@example.com', username='bench', password=None)
+        invoices = Invoice.objects.bulk_create(
+            Invoice(invoice_number=f"BENCH-{i:07d}", date=date(2025, 1, 1), customer_name=f"Customer {i}",
+                    customer_address="1 Main Street", prepared_by="Studio", subtotal=Decimal('100.00'),
+                    tax_rate=Decimal('18.00'), tax_amount=Decimal('18.00'), total_amount=Decimal('118.00'),
+                    created_by=user)
+            for i in range(rows)
+        )
+        if invoices[0].pk is None:
+            invoices = list(Invoice.objects.filter(created_by=user))
+        ServiceItem.objects.bulk_create(
+            ServiceItem(invoice=invoice, name=f"Service {j}", cost=Decimal('33.33'), quantity=j + 1,
+                        total=Decimal('33.33') * (j + 1))
+            for invoice in invoices for j in range(options['services'])
+        )
+        DataStore.objects.bulk_create(
+            DataStore(user=user, name=f"IMG_{i}.jpg", file=f"datastore/2025/01/01/IMG_{i}.jpg",
+                      file_type='photo', file_format='jpg', size=1024 * i)
+            for i in range(rows)
+        )
+
+        context = {'request': RequestFactory().get('/api/', HTTP_HOST='localhost')}
+        renderer = JSONRenderer()
+        cases = [
+            ('invoices', InvoiceSerializer, Invoice.objects.filter(created_by=user).prefetch_related('services')),
+            ('datastore', DataStoreSerializer, DataStore.objects.filter(user=user).select_related('transcode_job')),
+        ]
+        for name, serializer_class, queryset in cases:
+            plan = ReadPlan(serializer_class)
+            drf_time, drf_body = self.time(options['repeat'], lambda: renderer.render(
+                serializer_class(queryset.all(), many=True, context=context).data))
+            plan_time, plan_body = self.time(options['repeat'], lambda: renderer.render(
+                plan.serialize(queryset.all(), context)))
+            if drf_body != plan_body:
+                raise CommandError(f"{name}: ReadPlan output differs from {serializer_class.__name__}")
+            self.stdout.write(
+                f"{name:<10} rows={rows} serializer={drf_time * 1000:.0f} ms "
+                f"plan={plan_time * 1000:.0f} ms speedup={drf_time / plan_time:.1f}x"
+            )
+
+    def time(self, repeat, func):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
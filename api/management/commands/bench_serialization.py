@@ -0,0 +1,82 @@
+import gzip
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api import middleware, renderers
+from api.models import Invoice, ServiceItem
+from api.serializers import InvoiceSerializer
+
+
+def build_invoices(count, services_per_invoice):
+    """Unsaved invoices with their services pre-attached, so no DB is needed."""
+    now = timezone.now()
+    invoices = []
+    for i in range(1, count + 1):
+        invoice = Invoice(
+            id=i, invoice_number=f"INV-{i:06d}", date=date(2025, 1, 1 + i % 28),
+            customer_name=f"Customer {i}", customer_address=f"{i} Main Street, Springfield",
+            tax_number=None, prepared_by="Studio", subtotal=Decimal('1200.00'),
+            tax_rate=Decimal('18.00'), tax_amount=Decimal('216.00'), total_amount=Decimal('1416.00'),
+            status='sent', created_by_id=1, created_at=now, updated_at=now,
+        )
+        services = [
+            ServiceItem(id=i * services_per_invoice + j, invoice=invoice, name=f"Service {j}",
+                        cost=Decimal('400.00'), quantity=1 + j % 3, total=Decimal('400.00'))
+            for j in range(services_per_invoice)
+        ]
+        invoice._prefetched_objects_cache = {'services': services}
+        invoices.append(invoice)
+    return invoices
+
+
+def best_of(repeat, func):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = "Benchmark serialization, rendering and compression of InvoiceSerializer payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--services', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        invoices = build_invoices(options['rows'], options['services'])
+        repeat = options['repeat']
+
+        elapsed, data = best_of(repeat, lambda: InvoiceSerializer(invoices, many=True).data)
+        self.report('InvoiceSerializer', options['rows'], elapsed)
+
+        candidates = [('json (stdlib)', JSONRenderer())]
+        if renderers.orjson is not None:
+            candidates.append(('json (orjson)', renderers.ORJSONRenderer()))
+        if renderers.msgpack is not None:
+            candidates.append(('msgpack', renderers.MessagePackRenderer()))
+
+        for name, renderer in candidates:
+            elapsed, body = best_of(repeat, lambda: renderer.render(data))
+            self.report(name, options['rows'], elapsed, len(body))
+
+            codecs = [('gzip', lambda b: gzip.compress(b, 6))]
+            codecs += list(middleware.ENCODERS)
+            for codec, compress in codecs:
+                elapsed, compressed = best_of(repeat, lambda: compress(body))
+                self.report(f"  + {codec}", options['rows'], elapsed, len(compressed))
+
+    def report(self, name, rows, elapsed, size=None):
+        line = f"{name:<20} {elapsed * 1000:9.1f} ms {rows / elapsed:12.0f} rows/s"
+        if size is not None:
+            line += f" {size:12d} bytes"
+        self.stdout.write(line)
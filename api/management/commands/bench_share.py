@@ -0,0 +1,82 @@
+import hashlib
+import os
+import statistics
+import time
+import uuid
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api import sharing
+from api.models import DataStore, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch the same file through a signed share link and through the authenticated download "
+        "endpoint, and compare latency and database queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--size-kb', type=int, default=256)
+
+    def handle(self, *args, **options):
+        content = b'\xff\xd8\xff' + os.urandom(options['size_kb'] * 1024)
+        suffix = uuid.uuid4().hex[:12]
+        with transaction.atomic():
+            user = User.objects.create(username=f"bench-{suffix}", email=f"bench-{suffix}@example.com")
+            token = Token.objects.create(user=user).key
+            datastore = DataStore(user=user, name='bench.jpg', file_type='photo', file_format='jpg',
+                                  size=len(content), checksum=hashlib.sha256(content).hexdigest())
+            datastore.file.save('bench.jpg', ContentFile(content), save=False)
+            DataStore.objects.bulk_create([datastore])
+            try:
+                signed = sharing.file_token(datastore, sharing.expiry())
+                shared = sharing.share_url(RequestFactory(SERVER_NAME='localhost').get('/'), signed)
+                paths = {
+                    'signed share link': (Client(SERVER_NAME='localhost'), shared),
+                    'authenticated download': (
+                        Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f"Token {token}"),
+                        f"/api/datastore/{datastore.pk}/download/",
+                    ),
+                }
+                results = {label: self.run(client, path, options['requests']) for label, (client, path) in paths.items()}
+            finally:
+                datastore.file.delete(save=False)
+                transaction.set_rollback(True)
+
+        for label, r in results.items():
+            self.stdout.write(
+                f"{label:<24} p50={r['p50_ms']:7.2f} ms  mean={r['mean_ms']:7.2f} ms  "
+                f"queries/request={r['queries']:.1f}"
+            )
+        if results['signed share link']['queries']:
+            raise CommandError("The signed share path should not touch the database once the key version is cached.")
+
+    def run(self, client, path, count):
+        # One warm-up request fills the key-version cache and lazy imports.
+        self.fetch(client, path)
+        timings, queries = [], []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                self.fetch(client, path)
+                timings.append(time.perf_counter() - start)
+            queries.append(len(captured))
+        timings.sort()
+        return {
+            'p50_ms': timings[len(timings) // 2] * 1000,
+            'mean_ms': statistics.mean(timings) * 1000,
+            'queries': statistics.mean(queries),
+        }
+
+    def fetch(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}")
+        b''.join(response.streaming_content)
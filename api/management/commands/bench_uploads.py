@@ -0,0 +1,131 @@
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import force_authenticate
+
+from api.models import DataStore, User
+from api.views import DataStoreViewSet
+
+CHUNK = 1024 * 1024
+# Enough of an MP4 header for the magic-byte check.
+MP4_HEADER = b'\x00\x00\x00\x20ftypisom\x00\x00\x02\x00isomiso2avc1mp41'
+
+
+class MultipartStream:
+    """A multipart/form-data body generated on the fly, so a 1 GB upload costs no memory or I/O to produce."""
+
+    def __init__(self, boundary, size):
+        self.parts = [
+            (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"name\"\r\n\r\nbench.mp4\r\n"
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench.mp4\"\r\n"
+                f"Content-Type: video/mp4\r\n\r\n"
+            ).encode() + MP4_HEADER,
+            size - len(MP4_HEADER),
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+        self.length = len(self.parts[0]) + self.parts[1] + len(self.parts[2])
+        self.filler = b'\x00' * CHUNK
+
+    def read(self, size=-1):
+        size = CHUNK if size is None or size < 0 else size
+        while self.parts:
+            part = self.parts[0]
+            if isinstance(part, int):
+                if part == 0:
+                    self.parts.pop(0)
+                    continue
+                n = min(size, part, CHUNK)
+                self.parts[0] = part - n
+                return self.filler[:n]
+            if not part:
+                self.parts.pop(0)
+                continue
+            self.parts[0] = part[size:]
+            return part[:size]
+        return b''
+
+    # WSGIRequest wants it; the multipart parser only ever calls read().
+    readline = read
+
+
+def io_counters():
+    with open('/proc/self/io') as fh:
+        return {key: int(value) for key, value in (line.split(':') for line in fh)}
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload a large synthetic video through DataStoreViewSet.create with Django's default upload "
+        "handlers and with the streaming handler, and compare bytes read/written by the process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=1024)
+        parser.add_argument('--temp-dir', default=settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(),
+                            help="FILE_UPLOAD_TEMP_DIR for the default handlers. Use a directory on another "
+                                 "filesystem than MEDIA_ROOT (the usual deployment) to see the extra copy.")
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/io'):
+            raise CommandError("Needs /proc/self/io (Linux) to count I/O.")
+        size = options['size_mb'] * 1024 * 1024
+        same_fs = os.stat(options['temp_dir']).st_dev == os.stat(settings.MEDIA_ROOT).st_dev
+        self.stdout.write(
+            f"{options['size_mb']} MB upload; temp dir {options['temp_dir']} is on "
+            f"{'the same filesystem as' if same_fs else 'a different filesystem from'} MEDIA_ROOT"
+        )
+
+        results = {}
+        for label, streaming in (('default handlers', False), ('streaming handler', True)):
+            with override_settings(FILE_UPLOAD_TEMP_DIR=options['temp_dir']):
+                results[label] = self.upload(size, streaming)
+            r = results[label]
+            self.stdout.write(
+                f"{label:<18} {r['seconds']:7.2f}s  read {r['read'] / 1024 ** 2:8.1f} MB  "
+                f"written {r['written'] / 1024 ** 2:8.1f} MB  ({size / 1024 ** 2 / r['seconds']:.0f} MB/s)"
+            )
+
+        base, streamed = results['default handlers'], results['streaming handler']
+        base_io, streamed_io = base['read'] + base['written'], streamed['read'] + streamed['written']
+        self.stdout.write(f"Disk I/O: {streamed_io / base_io:.0%} of the default handlers' "
+                          f"({base_io / max(streamed_io, 1):.2f}x less)")
+
+    def upload(self, size, streaming):
+        boundary = uuid.uuid4().hex
+        body = MultipartStream(boundary, size)
+        request = WSGIRequest({
+            'REQUEST_METHOD': 'POST', 'PATH_INFO': '/api/datastore/', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http',
+            'CONTENT_TYPE': f'multipart/form-data; boundary={boundary}', 'CONTENT_LENGTH': str(body.length),
+            'wsgi.input': body,
+        })
+        view = DataStoreViewSet.as_view({'post': 'create'}, streaming_uploads=streaming)
+
+        with transaction.atomic():
+            user = User.objects.create(username=f"bench-{boundary[:12]}", email=f"bench-{boundary[:12]}@example.com")
+            force_authenticate(request, user=user)
+            before = io_counters()
+            started = time.perf_counter()
+            response = view(request)
+            elapsed = time.perf_counter() - started
+            after = io_counters()
+            if response.status_code != 201:
+                raise CommandError(f"Upload failed with {response.status_code}: {response.data}")
+            stored = DataStore.objects.get(pk=response.data['id'])
+            stored.file.delete(save=False)
+            request.close()
+            transaction.set_rollback(True)
+
+        return {
+            'seconds': elapsed,
+            'read': after['rchar'] - before['rchar'],
+            'written': after['wchar'] - before['wchar'],
+        }
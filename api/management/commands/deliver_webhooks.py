@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.events import WEBHOOK_WORKERS, deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver outbox events to registered webhooks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single delivery pass and exit.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between passes.")
+        parser.add_argument('--workers', type=int, default=WEBHOOK_WORKERS,
+                            help="Endpoints to deliver to concurrently.")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = deliver_pending(options['workers'])
+            if delivered:
+                self.stdout.write(f"Delivered {delivered} events")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
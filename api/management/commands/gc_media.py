@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import purge, tiering
+
+# Only directories the models write into are swept; anything else under
+# MEDIA_ROOT is reported as unmanaged and never touched.
+MANAGED_PREFIXES = ('datastore/', 'profile/', 'hls/')
+
+
+def partitions(root):
+    """
+    Split a tree into units of work for parallel walking: every directory two
+    levels down (e.g. datastore/2025/, hls/123/) plus the loose files above them.
+    """
+    units, loose = [], []
+    with os.scandir(root) as top:
+        for entry in top:
+            if not entry.is_dir(follow_symlinks=False):
+                loose.append(entry.path)
+                continue
+            with os.scandir(entry.path) as children:
+                for child in children:
+                    if child.is_dir(follow_symlinks=False):
+                        units.append(child.path)
+                    else:
+                        loose.append(child.path)
+    return units, loose
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark-and-sweep garbage collection of media files no longer referenced by any row. "
+        "Reports orphans by default; pass --delete to reclaim them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help="Remove orphans instead of only reporting them.")
+        parser.add_argument('--grace-hours', type=float, default=24.0,
+                            help="Ignore files modified more recently than this (uploads still in flight).")
+        parser.add_argument('--workers', type=int, default=4, help="Directories walked in parallel.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Paths checked per database query.")
+        parser.add_argument('--skip-cold', action='store_true', help="Do not sweep COLD_STORAGE_ROOT.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.cutoff = time.time() - options['grace_hours'] * 3600
+        self.lock = threading.Lock()
+
+        roots = [('media', settings.MEDIA_ROOT, purge.referenced, True)]
+        if not options['skip_cold']:
+            roots.append(('cold', tiering.COLD_STORAGE_ROOT, purge.referenced_cold, False))
+
+        for label, root, referenced, managed_only in roots:
+            if not os.path.isdir(root):
+                continue
+            self.totals = dict.fromkeys(('scanned', 'recent', 'unmanaged', 'orphans', 'orphan_bytes', 'reclaimed'), 0)
+            started = time.monotonic()
+            units, loose = partitions(root)
+            with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='gc') as pool:
+                jobs = [pool.submit(self.sweep_unit, root, [unit], referenced, managed_only) for unit in units]
+                jobs.append(pool.submit(self.sweep_unit, root, loose, referenced, managed_only))
+                for job in jobs:
+                    job.result()
+            t = self.totals
+            self.stdout.write(
+                f"{label} ({root}): scanned {t['scanned']} files in {time.monotonic() - started:.1f}s; "
+                f"{t['orphans']} orphans ({t['orphan_bytes'] / 1024 ** 2:.1f} MB), "
+                f"{'reclaimed ' + str(t['reclaimed']) if options['delete'] else 'not deleted (dry run)'}; "
+                f"skipped {t['recent']} within the grace period and {t['unmanaged']} unmanaged"
+            )
+
+    def sweep_unit(self, root, paths, referenced, managed_only):
+        """Walk ``paths`` (directories or files) and sweep them batch by batch."""
+        try:
+            batch = []
+            for path in paths:
+                files = [path] if os.path.isfile(path) else (
+                    os.path.join(directory, filename)
+                    for directory, _, filenames in os.walk(path) for filename in filenames
+                )
+                for file_path in files:
+                    batch.append(file_path)
+                    if len(batch) >= self.options['batch_size']:
+                        self.sweep(root, batch, referenced, managed_only)
+                        batch = []
+            if batch:
+                self.sweep(root, batch, referenced, managed_only)
+        finally:
+            close_old_connections()
+
+    def sweep(self, root, paths, referenced, managed_only):
+        counts = dict.fromkeys(self.totals, 0)
+        candidates = {}
+        for path in paths:
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            counts['scanned'] += 1
+            if managed_only and not name.startswith(MANAGED_PREFIXES):
+                counts['unmanaged'] += 1
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > self.cutoff:
+                counts['recent'] += 1
+                continue
+            candidates[name] = (path, stat.st_size)
+
+        orphans = set(candidates) - referenced(candidates) if candidates else set()
+        if orphans and self.options['delete']:
+            # Check again right before deleting so a row committed since the
+            # first query keeps its file.
+            orphans -= referenced(orphans)
+        for name in sorted(orphans):
+            path, size = candidates[name]
+            counts['orphans'] += 1
+            counts['orphan_bytes'] += size
+            if self.options['verbosity'] >= 2:
+                self.stdout.write(f"orphan {name} ({size} bytes)")
+            if self.options['delete']:
+                try:
+                    os.remove(path)
+                    counts['reclaimed'] += 1
+                except FileNotFoundError:
+                    pass
+
+        with self.lock:
+            for key, value in counts.items():
+                self.totals[key] += value
@@ -0,0 +1,115 @@
+import json
+import logging
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from api.models import User
+from api.views import UserLoginAPIView
+
+
+class Command(BaseCommand):
+    help = (
+        "In-process load test: measure legitimate login latency while attacker "
+        "threads hammer a victim account on /api/login/ with bad credentials, forging a "
+        "different X-Forwarded-For on every request. Creates and removes temporary users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attackers', type=int, default=8)
+        parser.add_argument('--attack-rate', type=float, default=20.0, help="Requests per second per attacker.")
+        parser.add_argument('--logins', type=int, default=20,
+                            help="Legitimate logins to time per phase, each by a distinct user and IP.")
+        parser.add_argument('--no-throttle', action='store_true',
+                            help="Disable login throttling to show the unprotected baseline.")
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        password = uuid.uuid4().hex
+        run = uuid.uuid4().hex[:8]
+        # Hash once; every temporary account shares the same password.
+        hashed = make_password(password)
+        users = User.objects.bulk_create(
+            User(email=f"loadtest-{run}-{i}@example.com", username='loadtest', password=hashed)
+            for i in range(options['logins'] * 2 + 1)
+        )
+        emails = [u.email for u in users]
+        victim = emails.pop()
+        throttle_classes = UserLoginAPIView.throttle_classes
+        if options['no_throttle']:
+            UserLoginAPIView.throttle_classes = []
+        cache.clear()
+        try:
+            idle = self.measure(emails[:options['logins']], password)
+            self.report('idle', idle)
+
+            stop = threading.Event()
+            counts = {'requests': 0, 'rejected': 0, 'lock': threading.Lock()}
+            attackers = [
+                threading.Thread(target=self.attack, args=(victim, i, options['attack_rate'], stop, counts))
+                for i in range(options['attackers'])
+            ]
+            for thread in attackers:
+                thread.start()
+            time.sleep(0.5)
+            under_attack = self.measure(emails[options['logins']:], password)
+            stop.set()
+            for thread in attackers:
+                thread.join()
+            self.report('under attack', under_attack)
+            self.stdout.write(f"attack requests={counts['requests']} rejected={counts['rejected']}")
+            if not options['no_throttle'] and not counts['rejected'] and counts['requests'] > 60 * options['attackers']:
+                self.stderr.write("No attack request was throttled: is the client IP read from X-Forwarded-For?")
+        finally:
+            UserLoginAPIView.throttle_classes = throttle_classes
+            cache.clear()
+            User.objects.filter(email__startswith=f"loadtest-{run}-").delete()
+
+    def client(self, ip):
+        return Client(SERVER_NAME='localhost', REMOTE_ADDR=ip)
+
+    def measure(self, emails, password):
+        timings = []
+        for i, email in enumerate(emails):
+            client = self.client(f"10.0.{i // 250}.{i % 250 + 1}")
+            start = time.perf_counter()
+            response = client.post('/api/login/', json.dumps({'email': email, 'password': password}),
+                                   content_type='application/json')
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                self.stderr.write(f"legitimate login failed with {response.status_code}")
+        return timings
+
+    def attack(self, email, index, rate, stop, counts):
+        client = self.client(f"192.0.2.{index + 1}")
+        interval = 1.0 / rate
+        sent = 0
+        try:
+            while not stop.wait(interval):
+                # A forged header must not give the attacker a fresh IP
+                # identity (see NUM_PROXIES); every other attempt also sprays
+                # a new email, so only the IP limits can stop those.
+                sent += 1
+                target = email if sent % 2 else f"spray-{index}-{sent}@example.com"
+                response = client.post('/api/login/', json.dumps({'email': target, 'password': 'wrong-password'}),
+                                       content_type='application/json',
+                                       HTTP_X_FORWARDED_FOR=f"198.51.100.{sent % 250 + 1}")
+                with counts['lock']:
+                    counts['requests'] += 1
+                    counts['rejected'] += response.status_code == 429
+        finally:
+            connection.close()
+
+    def report(self, phase, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{phase:<13} p50={statistics.median(timings) * 1000:7.1f} ms p95={p95 * 1000:7.1f} ms"
+        )
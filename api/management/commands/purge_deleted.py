@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.purge import PURGE_DELAY_SECONDS, purge_due
+
+
+class Command(BaseCommand):
+    help = "Purge files and rows of soft-deleted DataStore records left behind by the in-process queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single purge pass and exit.")
+        parser.add_argument('--interval', type=float, default=60.0, help="Seconds to sleep between passes.")
+        parser.add_argument('--delay', type=float, default=PURGE_DELAY_SECONDS,
+                            help="Only purge rows deleted at least this many seconds ago.")
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_due(options['delay'])
+            if purged:
+                self.stdout.write(f"Purged {purged} deleted files")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api import phash
+from api.models import DataStore, PhotoHash
+
+
+class Command(BaseCommand):
+    help = "Hash photos missing from the perceptual-hash index (or all photos with --full)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rehash every photo, not just missing ones.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        photos = DataStore.objects.filter(file_type='photo').order_by('pk')
+        if not options['full']:
+            photos = photos.filter(photo_hash__isnull=True)
+
+        indexed = skipped = 0
+        last_pk = 0
+        while True:
+            batch = list(photos.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for datastore in batch:
+                try:
+                    value = phash.index_datastore(datastore)
+                except FileNotFoundError:
+                    value = None
+                if value is None:
+                    skipped += 1
+                else:
+                    indexed += 1
+        self.stdout.write(f"Indexed {indexed} photos, skipped {skipped}; index holds {PhotoHash.objects.count()}")
@@ -0,0 +1,137 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Crm, DataStore, Invoice, ServiceItem, User
+
+SEED_EMAIL_PREFIX = 'seed-user-'
+SEED_PASSWORD = 'seed-password'
+
+CRM_STATUSES = (['New', 'Follow-up', 'Closed'], [50, 30, 20])
+EVENT_TYPES = (['Wedding', 'Portrait', 'Corporate', 'Birthday', 'Maternity', 'Product'], [30, 25, 15, 12, 10, 8])
+INVOICE_STATUSES = (['draft', 'sent', 'paid', 'cancelled'], [20, 30, 45, 5])
+SERVICES = ['Photography', 'Videography', 'Album', 'Prints', 'Drone footage', 'Editing', 'Travel']
+VIDEO_FORMATS = ['mp4', 'mov', 'avi']
+FIRST_NAMES = ['Asha', 'Ravi', 'Maria', 'John', 'Wei', 'Fatima', 'Liam', 'Priya', 'Noah', 'Sara']
+LAST_NAMES = ['Sharma', 'Garcia', 'Smith', 'Chen', 'Khan', 'Brown', 'Iyer', 'Silva', 'Okafor', 'Rossi']
+
+
+def pick(rng, choices):
+    values, weights = choices
+    return rng.choices(values, weights)[0]
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic users, CRM leads, invoices with services and DataStore rows for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--crm', type=int, default=500, help="Mean CRM leads per user.")
+        parser.add_argument('--invoices', type=int, default=300, help="Mean invoices per user.")
+        parser.add_argument('--files', type=int, default=1000, help="Mean DataStore rows per user.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true', help="Remove previously seeded users first.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['clear']:
+            deleted, _ = User.objects.filter(email__startswith=SEED_EMAIL_PREFIX).delete()
+            self.stdout.write(f"Removed {deleted} seeded rows")
+
+        start = User.objects.filter(email__startswith=SEED_EMAIL_PREFIX).count()
+        password = make_password(SEED_PASSWORD)
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(email=f"{SEED_EMAIL_PREFIX}{start + i}@example.com", username=f"seed{start + i}",
+                     first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), password=password)
+                for i in range(options['users'])
+            )
+            users = list(User.objects.filter(email__in=[u.email for u in users]))
+            totals = {'crm': 0, 'invoices': 0, 'services': 0, 'files': 0}
+            for user in users:
+                # Skewed volumes: a few studios are much busier than the rest.
+                scale = rng.paretovariate(2.0) / 2
+                totals['crm'] += self.seed_crm(rng, user, max(1, int(options['crm'] * scale)))
+                invoices, services = self.seed_invoices(rng, user, max(1, int(options['invoices'] * scale)))
+                totals['invoices'] += invoices
+                totals['services'] += services
+                totals['files'] += self.seed_files(rng, user, max(1, int(options['files'] * scale)))
+
+        self.stdout.write(
+            f"Seeded {len(users)} users, {totals['crm']} CRM leads, {totals['invoices']} invoices, "
+            f"{totals['services']} service items, {totals['files']} DataStore rows "
+            f"(password: {SEED_PASSWORD})"
+        )
+
+    def seed_crm(self, rng, user, count):
+        now = timezone.now()
+        rows = []
+        for _ in range(count):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            rows.append(Crm(
+                user=user, full_name=name,
+                email_address=f"{name.lower().replace(' ', '.')}@example.com",
+                phone_number=f"+91{rng.randint(7000000000, 9999999999)}",
+                price=str(int(rng.lognormvariate(10, 0.6))),
+                event_type=pick(rng, EVENT_TYPES), status=pick(rng, CRM_STATUSES),
+                created_at=now - timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+            ))
+        Crm.objects.bulk_create(rows, batch_size=1000)
+        return count
+
+    def seed_invoices(self, rng, user, count):
+        today = date.today()
+        invoices = [
+            Invoice(
+                invoice_number=f"S{user.pk}-{i:06d}", date=today - timedelta(days=rng.randint(0, 365)),
+                customer_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                customer_address=f"{rng.randint(1, 999)} Market Road", prepared_by=user.first_name,
+                subtotal=Decimal('0'), tax_rate=Decimal('18.00'), tax_amount=Decimal('0'),
+                total_amount=Decimal('0'), status=pick(rng, INVOICE_STATUSES), created_by=user,
+            )
+            for i in range(count)
+        ]
+        services = []
+        for invoice in invoices:
+            subtotal = Decimal('0')
+            for name in rng.sample(SERVICES, rng.randint(1, 4)):
+                cost = Decimal(int(rng.lognormvariate(8.5, 0.7))).quantize(Decimal('0.01'))
+                quantity = rng.choice([1, 1, 1, 2, 3])
+                subtotal += cost * quantity
+                services.append(ServiceItem(invoice=invoice, name=name, cost=cost, quantity=quantity,
+                                            total=cost * quantity))
+            invoice.subtotal = subtotal
+            invoice.tax_amount = (subtotal * invoice.tax_rate / 100).quantize(Decimal('0.01'))
+            invoice.total_amount = subtotal + invoice.tax_amount
+
+        Invoice.objects.bulk_create(invoices, batch_size=1000)
+        if invoices and invoices[0].pk is None:
+            # Backends without RETURNING: re-read the ids.
+            ids = dict(Invoice.objects.filter(created_by=user).values_list('invoice_number', 'pk'))
+            for invoice in invoices:
+                invoice.pk = ids[invoice.invoice_number]
+        ServiceItem.objects.bulk_create(services, batch_size=1000)
+        return count, len(services)
+
+    def seed_files(self, rng, user, count):
+        rows = []
+        for i in range(count):
+            day = date.today() - timedelta(days=rng.randint(0, 365 * 2))
+            if rng.random() < 0.85:
+                fmt, file_type = 'jpg', 'photo'
+                size = int(rng.lognormvariate(15.4, 0.5))     # ~5 MB
+            else:
+                fmt, file_type = rng.choice(VIDEO_FORMATS), 'video'
+                size = int(rng.lognormvariate(19.1, 0.9))     # ~200 MB
+            rows.append(DataStore(
+                user=user, name=f"{'IMG' if file_type == 'photo' else 'VID'}_{i:05d}.{fmt}",
+                file=f"datastore/{day:%Y/%m/%d}/seed_{user.pk}_{i:05d}.{fmt}",
+                file_type=file_type, file_format=fmt, size=size,
+            ))
+        DataStore.objects.bulk_create(rows, batch_size=1000)
+        return count
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from api import tiering
+from api.models import DataStore
+
+
+class Command(BaseCommand):
+    help = "Move DataStore files untouched for --days days to cold storage (or back, with --restore)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=tiering.TIERING_IDLE_DAYS)
+        parser.add_argument('--limit', type=int, help="Move at most this many files.")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would move.")
+        parser.add_argument('--restore', type=int, nargs='+', metavar='ID', help="Restore these DataStore ids instead.")
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            self.restore(options['restore'])
+            return
+
+        # Make this process's own pending reads count before choosing.
+        tiering.access_tracker.flush()
+        candidates = tiering.idle_candidates(options['days']).order_by('pk')
+        if options['dry_run']:
+            count = candidates.count()
+            self.stdout.write(f"{count} files idle for {options['days']}+ days would move to cold storage")
+            return
+
+        moved = skipped = missing = 0
+        moved_bytes = 0
+        last_pk = 0
+        limit = options['limit']
+        while limit is None or moved < limit:
+            batch = list(candidates.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for datastore in batch:
+                if limit is not None and moved >= limit:
+                    break
+                try:
+                    ok = tiering.demote(datastore)
+                except FileNotFoundError:
+                    missing += 1
+                    continue
+                if ok:
+                    moved += 1
+                    moved_bytes += datastore.size or 0
+                else:
+                    skipped += 1
+        self.stdout.write(
+            f"Moved {moved} files ({moved_bytes / 1024 ** 2:.1f} MB) to {tiering.COLD_STORAGE_ROOT}; "
+            f"{skipped} changed during the move, {missing} missing from hot storage"
+        )
+
+    def restore(self, ids):
+        restored = 0
+        for datastore in DataStore.objects.filter(pk__in=ids, storage_tier='cold'):
+            restored += tiering.restore(datastore)
+        self.stdout.write(f"Restored {restored} files to hot storage")
@@ -0,0 +1,50 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.transcoding import claim_job, requeue_stale, run_job
+
+
+class Command(BaseCommand):
+    help = "Run the HLS transcoding worker pool for queued DataStore videos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'TRANSCODE_WORKERS', 2),
+                            help="Maximum number of concurrent ffmpeg jobs.")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Re-queued {requeued} stale jobs")
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='transcode') as pool:
+            workers = [pool.submit(self.work, stop, options) for _ in range(options['workers'])]
+            try:
+                for worker in workers:
+                    worker.result()
+            except KeyboardInterrupt:
+                stop.set()
+
+    def work(self, stop, options):
+        try:
+            while not stop.is_set():
+                job = claim_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['interval'])
+                    continue
+                started = time.monotonic()
+                ok = run_job(job)
+                self.stdout.write(
+                    f"DataStore {job.datastore_id}: {'done' if ok else 'failed'} in {time.monotonic() - started:.1f}s"
+                )
+        finally:
+            close_old_connections()
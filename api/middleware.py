@@ -0,0 +1,90 @@
+# middleware.py
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+def _compress_brotli(content):
+    return brotli.compress(content, quality=5)
+
+
+def _compress_zstd(content):
+    return zstandard.ZstdCompressor(level=3).compress(content)
+
+
+# In order of preference when the client accepts several with equal weight.
+ENCODERS = [
+    (name, func) for name, func, available in (
+        ('zstd', _compress_zstd, zstandard is not None),
+        ('br', _compress_brotli, brotli is not None),
+    ) if available
+]
+
+# Media is already compressed; spending CPU on it only adds latency.
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip')
+
+re_coding = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for part in header.split(','):
+        match = re_coding.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    return accepted
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that also negotiates zstd and brotli when those libraries
+    are installed, and skips bodies below COMPRESSION_MIN_SIZE bytes.
+    """
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith(INCOMPRESSIBLE_TYPES):
+            return response
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return super().process_response(request, response)
+
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        candidates = [(accepted[name], -i, name, func) for i, (name, func) in enumerate(ENCODERS)
+                      if accepted.get(name, 0) > 0]
+        if not candidates or max(candidates)[0] < accepted.get('gzip', 0):
+            return super().process_response(request, response)
+
+        _, _, encoding, compress = max(candidates)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = compress(response.content)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
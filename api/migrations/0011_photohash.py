@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_transcodejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoHash',
+            fields=[
+                ('datastore', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='photo_hash', serialize=False, to='api.datastore')),
+                ('hash', models.BigIntegerField()),
+                ('chunk0', models.PositiveIntegerField()),
+                ('chunk1', models.PositiveIntegerField()),
+                ('chunk2', models.PositiveIntegerField()),
+                ('chunk3', models.PositiveIntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'chunk0'], name='api_photoha_user_id_7dafbf_idx'), models.Index(fields=['user', 'chunk1'], name='api_photoha_user_id_f92199_idx'), models.Index(fields=['user', 'chunk2'], name='api_photoha_user_id_190777_idx'), models.Index(fields=['user', 'chunk3'], name='api_photoha_user_id_98b6d7_idx')],
+            },
+        ),
+    ]
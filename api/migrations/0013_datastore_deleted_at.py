@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_datastore_storage_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datastore',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_datastore_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datastore',
+            name='checksum',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_datastore_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='share_key_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_user_share_key_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='crm',
+            name='email_address',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='datastore',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
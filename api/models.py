@@ -17,6 +17,10 @@ class User(AbstractUser):
     role = models.CharField(max_length=20,blank=True,null=True)
     location = models.CharField(max_length=20,blank=True,null=True)
     profile_photo = models.ImageField(upload_to="profile/",blank=True,null=True)
+    # {"<size>": {"webp": <name>, "jpeg": <name>}}, filled in by api.avatars
+    avatar_renditions = models.JSONField(default=dict, blank=True)
+    # Part of every share link's signature; bumping it revokes them all.
+    share_key_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -29,15 +33,17 @@ class User(AbstractUser):
 class Crm(models.Model):
     full_name = models.CharField(max_length=255,blank=True,null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="crms") 
-    email_address = models.CharField(max_length=255,blank=True,null=True)
+    email_address = models.CharField(max_length=255,blank=True,null=True,db_index=True)
     phone_number = models.CharField(max_length=255,blank=True,null=True)
     price = models.CharField(max_length=255,blank=True,null=True)
     event_type = models.CharField(max_length=255,blank=True,null=True)   
     status = models.CharField(max_length=255,blank=True,null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
-        return self.full_name
+        # full_name is optional; the admin needs a string for every row.
+        return self.full_name or f"Crm #{self.pk}"
 
 
 class Invoice(models.Model):
@@ -61,7 +67,7 @@ class Invoice(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='invoices')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -87,6 +93,13 @@ class ServiceItem(models.Model):
 
 
 
+class LiveDataStoreManager(models.Manager):
+    """Hides soft-deleted rows; api.purge removes them in the background."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class DataStore(models.Model):
     FILE_TYPES = (
         ('photo', 'Photo'),
@@ -99,7 +112,24 @@ class DataStore(models.Model):
     file_type = models.CharField(max_length=10, choices=FILE_TYPES)
     file_format = models.CharField(max_length=50)
     size = models.BigIntegerField()  # Size in bytes
+    # SHA-256 of the content, computed while the upload streams in.
+    checksum = models.CharField(max_length=64, blank=True, default='', db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    STORAGE_TIERS = (
+        ('hot', 'Hot'),
+        ('cold', 'Cold'),
+    )
+    storage_tier = models.CharField(max_length=10, choices=STORAGE_TIERS, default='hot', db_index=True)
+    # Name of the blob in cold storage while storage_tier is 'cold'.
+    cold_name = models.CharField(max_length=255, blank=True, default='')
+    # Written in batches by api.tiering, never per request.
+    last_accessed_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Set by destroy; the row and its files are purged later by api.purge.
+    deleted_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = LiveDataStoreManager()
+    all_objects = models.Manager()
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -123,4 +153,105 @@ class DataStore(models.Model):
         if not self.size and self.file:
             self.size = self.file.size
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class Webhook(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhooks')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64)
+    is_active = models.BooleanField(default=True)
+    # Id of the last OutboxEvent successfully delivered to this endpoint.
+    last_event_id = models.BigIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user} - {self.url}"
+
+
+class OutboxEvent(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='outbox_events')
+    event_type = models.CharField(max_length=50)
+    object_type = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.object_id}"
+
+
+class Tombstone(models.Model):
+    # No FK constraint: tombstones are written while the owner itself may be
+    # in the middle of a cascading delete.
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    model_name = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return f"{self.model_name} #{self.object_id}"
+
+
+class TranscodeJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    datastore = models.OneToOneField(DataStore, on_delete=models.CASCADE, related_name='transcode_job')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    # Relative to MEDIA_ROOT; a fresh directory per successful run.
+    output_dir = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.datastore_id} - {self.status}"
+
+
+class PhotoHash(models.Model):
+    """
+    64-bit difference hash of a photo, split into four 16-bit chunks so
+    near-duplicate lookups can use indexed exact matches (multi-index hashing).
+    """
+    datastore = models.OneToOneField(DataStore, on_delete=models.CASCADE, primary_key=True, related_name='photo_hash')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # Stored signed so it fits a BigIntegerField; see api.phash.to_signed().
+    hash = models.BigIntegerField()
+    chunk0 = models.PositiveIntegerField()
+    chunk1 = models.PositiveIntegerField()
+    chunk2 = models.PositiveIntegerField()
+    chunk3 = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'chunk0']),
+            models.Index(fields=['user', 'chunk1']),
+            models.Index(fields=['user', 'chunk2']),
+            models.Index(fields=['user', 'chunk3']),
+        ]
+
+    def __str__(self):
+        return f"{self.datastore_id} - {self.hash & 0xFFFFFFFFFFFFFFFF:016x}"
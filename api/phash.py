@@ -0,0 +1,182 @@
+# phash.py
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+
+from django.db.models import Q
+
+from . import tiering
+from .models import PhotoHash
+
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# Near-duplicate threshold used when the client does not pass one.
+DEFAULT_DISTANCE = 8
+MAX_DISTANCE = 16
+
+
+def dhash(fileobj):
+    """
+    64-bit difference hash: downscale to 9x8 greyscale and record whether each
+    pixel is brighter than its right-hand neighbour. Robust to re-encoding,
+    resizing and small exposure changes.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(fileobj) as image:
+        # Decode JPEGs at reduced scale; the hash only needs 9x8 pixels.
+        image.draft('L', (64, 64))
+        image = ImageOps.exif_transpose(image).convert('L').resize((9, 8), Image.LANCZOS)
+        pixels = list(image.getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def to_signed(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value & 0xFFFFFFFFFFFFFFFF
+
+
+def split(value):
+    return [(value >> (CHUNK_BITS * i)) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+@lru_cache(maxsize=None)
+def flip_masks(radius):
+    """Every 16-bit mask with at most ``radius`` bits set."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return masks
+
+
+def chunk_neighbours(chunk, radius):
+    return [chunk ^ mask for mask in flip_masks(radius)]
+
+
+def chunk_radius(distance):
+    # Pigeonhole: if two hashes differ in <= distance bits, at least one of the
+    # four chunks differs in <= distance // 4 bits.
+    return distance // CHUNKS
+
+
+def save_hash(datastore, value):
+    chunks = split(value)
+    PhotoHash.objects.update_or_create(
+        datastore=datastore,
+        defaults={'user_id': datastore.user_id, 'hash': to_signed(value),
+                  **{f"chunk{i}": chunk for i, chunk in enumerate(chunks)}},
+    )
+
+
+def hash_file(fileobj):
+    """dHash of an open image file, or None if it is not a readable image."""
+    position = fileobj.tell()
+    fileobj.seek(0)
+    try:
+        return dhash(fileobj)
+    except (OSError, ValueError, SyntaxError):
+        # PIL raises these for truncated or non-image content.
+        return None
+    finally:
+        fileobj.seek(position)
+
+
+def index_datastore(datastore):
+    """(Re)hash a stored photo; returns the hash or None."""
+    with tiering.open_blob(datastore) as fh:
+        value = hash_file(fh)
+    if value is not None:
+        save_hash(datastore, value)
+    return value
+
+
+def find_similar(user, value, distance=DEFAULT_DISTANCE, exclude=None):
+    """Return [(datastore_id, distance)] within ``distance`` bits of ``value``, nearest first."""
+    radius = chunk_radius(distance)
+    query = Q()
+    for i, chunk in enumerate(split(value)):
+        query |= Q(**{f"chunk{i}__in": chunk_neighbours(chunk, radius)})
+    candidates = PhotoHash.objects.filter(query, user=user).values_list('datastore_id', 'hash')
+
+    matches = []
+    for datastore_id, other in candidates:
+        if datastore_id == exclude:
+            continue
+        d = hamming(value, to_unsigned(other))
+        if d <= distance:
+            matches.append((datastore_id, d))
+    matches.sort(key=lambda m: (m[1], m[0]))
+    return matches
+
+
+class MultiIndexHash:
+    """
+    In-memory multi-index hash table over 64-bit hashes, used for whole-library
+    scans (duplicate reports) where one DB round-trip per photo would dominate.
+    """
+
+    def __init__(self, items=()):
+        self.hashes = {}
+        self.tables = [defaultdict(list) for _ in range(CHUNKS)]
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key, value):
+        self.hashes[key] = value
+        for table, chunk in zip(self.tables, split(value)):
+            table[chunk].append(key)
+
+    def search(self, value, distance):
+        radius = chunk_radius(distance)
+        seen = set()
+        matches = []
+        for table, chunk in zip(self.tables, split(value)):
+            for neighbour in chunk_neighbours(chunk, radius):
+                for key in table.get(neighbour, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    d = hamming(value, self.hashes[key])
+                    if d <= distance:
+                        matches.append((key, d))
+        return matches
+
+    def duplicate_groups(self, distance):
+        """Connected components of the "within distance" graph, largest first."""
+        parent = {key: key for key in self.hashes}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key, value in self.hashes.items():
+            for other, _ in self.search(value, distance):
+                root_a, root_b = find(key), find(other)
+                if root_a != root_b:
+                    parent[root_b] = root_a
+
+        groups = defaultdict(list)
+        for key in self.hashes:
+            groups[find(key)].append(key)
+        return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
@@ -0,0 +1,161 @@
+# purge.py
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import tiering
+from .models import DataStore, PhotoHash, Tombstone, TranscodeJob, User
+
+logger = logging.getLogger(__name__)
+
+PURGE_WORKERS = getattr(settings, 'PURGE_WORKERS', 1)
+# purge_deleted leaves rows younger than this to the in-process queue.
+PURGE_DELAY_SECONDS = getattr(settings, 'PURGE_DELAY_SECONDS', 300)
+
+_executor = ThreadPoolExecutor(max_workers=PURGE_WORKERS, thread_name_prefix='purge')
+
+
+def soft_delete(datastore):
+    """
+    Hide a DataStore row at once and queue its files for removal. Clients see
+    the delete immediately (tombstone, hash and pending transcode go now);
+    storage I/O happens off the request thread.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        deleted = DataStore.objects.filter(pk=datastore.pk).update(deleted_at=now, updated_at=now)
+        if not deleted:
+            return False
+        _hidden([(datastore.pk, datastore.user_id)])
+    return True
+
+
+def soft_delete_many(queryset):
+    """
+    soft_delete for a whole queryset (admin bulk purge): every live row in it
+    is hidden with a single UPDATE. Returns the number of rows hidden.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(queryset.filter(deleted_at__isnull=True).select_for_update().values_list('pk', 'user_id'))
+        if rows:
+            DataStore.all_objects.filter(pk__in=[pk for pk, _ in rows]).update(deleted_at=now, updated_at=now)
+            _hidden(rows)
+    return len(rows)
+
+
+def _hidden(rows):
+    """Follow-up of hiding ``rows`` of (pk, user_id), in the same transaction."""
+    ids = [pk for pk, _ in rows]
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, model_name='datastore', object_id=pk) for pk, user_id in rows
+    ])
+    PhotoHash.objects.filter(datastore_id__in=ids).delete()
+    TranscodeJob.objects.filter(datastore_id__in=ids, status='queued').update(status='failed', error='File deleted.')
+    schedule_purge(ids)
+
+
+def blob_names(datastore, job=None):
+    """(hot names, cold names, HLS directories) owned by a DataStore row."""
+    hot = [datastore.file.name] if datastore.file and datastore.storage_tier == 'hot' else []
+    cold = [datastore.cold_name] if datastore.storage_tier == 'cold' and datastore.cold_name else []
+    hls = [job.output_dir] if job is not None and job.output_dir else []
+    return hot, cold, hls
+
+
+def remove_blobs(hot=(), cold=(), hls=()):
+    # Storage deletes ignore files that are already gone, so this is safe to retry.
+    for name in hot:
+        default_storage.delete(name)
+    for name in cold:
+        tiering.cold_storage.delete(name)
+    for directory in hls:
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, directory), ignore_errors=True)
+
+
+def purge(ids):
+    """Delete the files of soft-deleted rows, then the rows themselves."""
+    rows = DataStore.all_objects.filter(pk__in=ids, deleted_at__isnull=False)
+    jobs = {job.datastore_id: job for job in TranscodeJob.objects.filter(datastore_id__in=ids)}
+    purged = 0
+    for datastore in rows:
+        # Files first: if we die in between, the row is still there to retry.
+        remove_blobs(*blob_names(datastore, jobs.get(datastore.pk)))
+        datastore.delete()
+        purged += 1
+    return purged
+
+
+def purge_due(delay=PURGE_DELAY_SECONDS, batch_size=500):
+    """Purge soft-deleted rows the background queue has not got to (e.g. after a restart)."""
+    cutoff = timezone.now() - timedelta(seconds=delay)
+    total = 0
+    while True:
+        ids = list(DataStore.all_objects.filter(deleted_at__lt=cutoff).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += purge(ids)
+
+
+def _run(ids):
+    try:
+        purge(ids)
+    except Exception:
+        logger.exception("Purging DataStore rows %s failed", ids)
+    finally:
+        close_old_connections()
+
+
+def schedule_purge(ids):
+    """Purge rows on a background thread once the current transaction commits."""
+    ids = list(ids)
+    transaction.on_commit(lambda: _executor.submit(_run, ids))
+
+
+def schedule_blob_removal(hot=(), cold=(), hls=()):
+    """Remove files whose rows are already gone (replaced uploads, cascades)."""
+    hot, cold, hls = list(hot), list(cold), list(hls)
+    if hot or cold or hls:
+        transaction.on_commit(lambda: _executor.submit(remove_blobs, hot, cold, hls))
+
+
+def user_blob_names(user):
+    names = [user.profile_photo.name] if user.profile_photo else []
+    for renditions in (user.avatar_renditions or {}).values():
+        names.extend(renditions.values())
+    return names
+
+
+def referenced(names):
+    """Subset of MEDIA_ROOT-relative ``names`` still referenced by a row."""
+    names = list(names)
+    found = set(DataStore.all_objects.filter(file__in=names).values_list('file', flat=True))
+    found.update(User.objects.filter(profile_photo__in=names).values_list('profile_photo', flat=True))
+
+    hls_dirs = {os.path.dirname(name) for name in names if name.startswith('hls/')}
+    if hls_dirs:
+        live = set(TranscodeJob.objects.filter(output_dir__in=hls_dirs).values_list('output_dir', flat=True))
+        found.update(name for name in names if os.path.dirname(name) in live)
+
+    avatar_users = {}
+    for name in names:
+        parts = name.split('/')
+        if name.startswith('profile/avatars/') and len(parts) == 4 and parts[2].isdigit():
+            avatar_users.setdefault(int(parts[2]), []).append(name)
+    if avatar_users:
+        for renditions in User.objects.filter(pk__in=avatar_users).values_list('avatar_renditions', flat=True):
+            for files in (renditions or {}).values():
+                found.update(files.values())
+    return found
+
+
+def referenced_cold(names):
+    """Subset of cold-storage ``names`` still referenced by a row."""
+    return set(DataStore.all_objects.filter(cold_name__in=list(names)).values_list('cold_name', flat=True))
@@ -0,0 +1,175 @@
+# readplans.py
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+# Step "column" for fields whose converter takes the whole values() row.
+WHOLE_ROW = object()
+
+
+def relation_lookup(model, source):
+    """Map a dotted source over to-one relations to a values() lookup, or None."""
+    parts = source.split('.')
+    for part in parts[:-1]:
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if not (field.many_to_one or field.one_to_one):
+            return None
+        model = field.related_model
+    try:
+        field = model._meta.get_field(parts[-1])
+    except FieldDoesNotExist:
+        return None
+    if field.is_relation:
+        return None
+    return '__'.join(parts)
+
+
+class ReadPlan:
+    """
+    Read-only fast path for a ModelSerializer.
+
+    The serializer's fields are introspected once and turned into a list of
+    ``(key, column, converter)`` steps that are applied to ``values()`` rows,
+    so listing N rows costs one query per nesting level and no per-row
+    serializer instances. Output is identical to ``serializer_class(many=True)``.
+    Serializers using fields the plan does not understand (method fields,
+    custom sources, ...) transparently fall back to the regular serializer.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._compiled = False
+
+    def compile(self):
+        if self._compiled:
+            return
+        serializer = self.serializer_class()
+        model = serializer.Meta.model
+        self.model = model
+        self.columns = []
+        self.steps = []
+        self.nested = []
+        self.supported = True
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+                relation = model._meta.get_field(source)
+                if not relation.one_to_many:
+                    self.supported = False
+                    break
+                child = ReadPlan(type(field.child))
+                child.compile()
+                self.supported = self.supported and child.supported
+                self.nested.append((name, relation.field.attname, child))
+                self.steps.append((name, None, None))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                self.columns.append(source)
+                self.steps.append((name, source, None))
+            elif isinstance(field, serializers.FileField):
+                self.columns.append(source)
+                spec = ('file', field, model._meta.get_field(source).storage)
+                if hasattr(field, 'row_converter'):
+                    # The URL depends on other columns of the row too.
+                    self.columns.extend(field.row_columns)
+                    self.steps.append((name, WHOLE_ROW, spec))
+                else:
+                    self.steps.append((name, source, spec))
+            elif isinstance(field, (serializers.RelatedField, serializers.Serializer, serializers.SerializerMethodField)) \
+                    or source == '*':
+                self.supported = False
+                break
+            elif '.' in source:
+                # Follow single-valued relations with a join; a missing related
+                # row yields None, as DRF does.
+                column = relation_lookup(model, source)
+                if column is None:
+                    self.supported = False
+                    break
+                self.columns.append(column)
+                self.steps.append((name, column, field.to_representation))
+            else:
+                self.columns.append(source)
+                self.steps.append((name, source, field.to_representation))
+
+        self._compiled = True
+
+    def serialize(self, queryset, context=None):
+        self.compile()
+        if not self.supported:
+            return self.serializer_class(queryset, many=True, context=context or {}).data
+        return self._rows(queryset, context or {})
+
+    def _rows(self, queryset, context, group_by=None):
+        columns = list(dict.fromkeys(self.columns))
+        if group_by is not None:
+            columns.append(group_by)
+        needs_pk = bool(self.nested)
+        if needs_pk and 'pk' not in columns:
+            columns.append('pk')
+        rows = list(queryset.values(*columns))
+
+        nested_data = {}
+        for name, fk_column, child in self.nested:
+            child_qs = child.model._default_manager.filter(
+                **{f"{fk_column}__in": queryset.order_by().values('pk')}
+            ).order_by('pk')
+            grouped = defaultdict(list)
+            for parent_id, item in child._rows(child_qs, context, group_by=fk_column):
+                grouped[parent_id].append(item)
+            nested_data[name] = grouped
+
+        converters = [(name, column, self._converter(spec, context)) for name, column, spec in self.steps]
+        result = []
+        for row in rows:
+            item = {}
+            for name, column, convert in converters:
+                if column is None:
+                    item[name] = nested_data[name].get(row['pk'], [])
+                    continue
+                if column is WHOLE_ROW:
+                    item[name] = convert(row)
+                    continue
+                value = row[column]
+                item[name] = None if value is None else (convert(value) if convert else value)
+            result.append((row[group_by], item) if group_by is not None else item)
+        return result
+
+    def _converter(self, spec, context):
+        if not isinstance(spec, tuple):
+            return spec
+        _, field, storage = spec
+        request = context.get('request')
+        if hasattr(field, 'row_converter'):
+            return field.row_converter(self._file_converter(field, storage, request), request)
+        return self._file_converter(field, storage, request)
+
+    def _file_converter(self, field, storage, request):
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return lambda name: name or None
+
+        base_url = getattr(storage, 'base_url', None) if isinstance(storage, FileSystemStorage) else None
+        if base_url and base_url.startswith('/') and not base_url.startswith('//'):
+            # Same result as storage.url() + build_absolute_uri(), without
+            # the urljoin/host lookup per row.
+            prefix = request.build_absolute_uri(base_url) if request is not None else base_url
+
+            def fast_file_url(name):
+                return prefix + filepath_to_uri(name).lstrip('/') if name else None
+            return fast_file_url
+
+        def file_url(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return file_url
@@ -1,7 +1,11 @@
 # serializers.py
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from .models import *
+from .batch import BATCH_MAX_REQUESTS
+from .events import UnsafeWebhookURL, check_webhook_url
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -56,9 +60,22 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         return data
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'created_at', 'updated_at',"phone_number","profile_photo","location","role")
+        fields = ('id', 'email', 'username', 'first_name', 'last_name', 'created_at', 'updated_at',"phone_number","profile_photo","avatar","location","role")
+
+    def get_avatar(self, obj):
+        # Square renditions keyed by size, e.g. {"128": {"webp": url, "jpeg": url}}
+        request = self.context.get('request')
+        urls = {}
+        for size, files in (obj.avatar_renditions or {}).items():
+            urls[size] = {}
+            for ext, name in files.items():
+                url = default_storage.url(name)
+                urls[size][ext] = request.build_absolute_uri(url) if request is not None else url
+        return urls
 
 class CrmSerializer(serializers.ModelSerializer):
     class Meta:
@@ -119,13 +136,103 @@ class InvoiceSerializer(serializers.ModelSerializer):
 
 
 
+class DataStoreFileField(serializers.FileField):
+    """
+    The media URL of a hot file. A cold file is not under MEDIA_ROOT, so it
+    points at the authenticated download endpoint, which streams it from
+    cold storage. Listing a file is not an access: only the endpoints that
+    actually read it keep it from being demoted.
+    """
+    # Columns ReadPlan must fetch to call row_converter.
+    row_columns = ('id', 'storage_tier')
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        datastore = value.instance
+        if datastore.storage_tier == 'cold':
+            return self.cold_url(self.context.get('request'), datastore.pk)
+        return super().to_representation(value)
+
+    def row_converter(self, hot_url, request):
+        """ReadPlan's equivalent of to_representation, for values() rows."""
+        def convert(row):
+            name = row[self.source]
+            if not name:
+                return None
+            if row['storage_tier'] == 'cold':
+                return self.cold_url(request, row['id'])
+            return hot_url(name)
+        return convert
+
+    def cold_url(self, request, pk):
+        url = reverse('datastore-download', args=[pk])
+        return request.build_absolute_uri(url) if request is not None else url
+
+
 class DataStoreSerializer(serializers.ModelSerializer):
+    file = DataStoreFileField()
+    # Null for photos; queued/running/done/failed for videos.
+    transcode_status = serializers.CharField(source='transcode_job.status', read_only=True, default=None)
+
     class Meta:
         model = DataStore
-        fields = ['id', 'name', 'file', 'file_type', 'file_format', 'size', 'uploaded_at']
-        read_only_fields = ['id', 'file_type', 'file_format', 'size', 'uploaded_at']
+        fields = ['id', 'name', 'file', 'file_type', 'file_format', 'size', 'checksum', 'uploaded_at',
+                  'transcode_status', 'storage_tier']
+        read_only_fields = ['id', 'file_type', 'file_format', 'size', 'checksum', 'uploaded_at', 'storage_tier']
     
     def create(self, validated_data):
         # Set the user from the request
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+
+class WebhookSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Webhook
+        fields = ['id', 'url', 'secret', 'is_active', 'last_event_id', 'failure_count', 'created_at']
+        read_only_fields = ['id', 'secret', 'last_event_id', 'failure_count', 'created_at']
+
+    def validate_url(self, value):
+        try:
+            check_webhook_url(value)
+        except UnsafeWebhookURL as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+
+class OutboxEventSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='event_type')
+    data = serializers.JSONField(source='payload')
+
+    class Meta:
+        model = OutboxEvent
+        fields = ['id', 'type', 'object_type', 'object_id', 'data', 'created_at']
+
+
+class ShareRequestSerializer(serializers.Serializer):
+    # Lifetime of the link in seconds; capped at SHARE_MAX_TTL.
+    expires_in = serializers.IntegerField(required=False, min_value=60)
+    # Set links only: which of the user's files the link covers.
+    file_type = serializers.ChoiceField(choices=DataStore.FILE_TYPES, required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    uploaded_after = serializers.DateTimeField(required=False)
+    uploaded_before = serializers.DateTimeField(required=False)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    # e.g. "/api/invoices/stats/?period=month"
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    # Run the entries concurrently; only honoured when all of them are reads.
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f"At most {BATCH_MAX_REQUESTS} requests per batch.")
+        return value
@@ -0,0 +1,133 @@
+# sharing.py
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import F
+from django.urls import reverse
+
+from .models import DataStore, User
+
+SHARE_SALT = 'api.share'
+SHARE_DEFAULT_TTL = getattr(settings, 'SHARE_DEFAULT_TTL', 7 * 24 * 3600)
+SHARE_MAX_TTL = getattr(settings, 'SHARE_MAX_TTL', 30 * 24 * 3600)
+# Upper bound on how long shared responses may sit in a proxy, i.e. how long
+# a revocation can take to reach caches outside our control.
+SHARE_CACHE_MAX_AGE = getattr(settings, 'SHARE_CACHE_MAX_AGE', 3600)
+SHARE_SET_LIMIT = getattr(settings, 'SHARE_SET_LIMIT', 1000)
+
+
+class ShareError(Exception):
+    def __init__(self, message, status_code=404):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def key_version(user_id):
+    # Read from the database every time (a primary key lookup) rather than
+    # a cache, so a revoke takes effect in every worker at once.
+    version = User.objects.filter(pk=user_id).values_list('share_key_version', flat=True).first()
+    if version is None:
+        raise ShareError("Link owner no longer exists.")
+    return version
+
+
+def revoke(user):
+    """Invalidate every share link the user has handed out."""
+    User.objects.filter(pk=user.pk).update(share_key_version=F('share_key_version') + 1)
+    return User.objects.filter(pk=user.pk).values_list('share_key_version', flat=True).get()
+
+
+def payload(user_id, pk, file_name, display_name, checksum, version, expires):
+    return {
+        'k': 'f', 'u': user_id, 'v': version, 'e': expires, 'i': pk, 'n': file_name, 'h': checksum[:16],
+        'd': display_name or os.path.basename(file_name),
+    }
+
+
+def file_payload(datastore, version, expires):
+    return payload(
+        datastore.user_id, datastore.pk, datastore.file.name, datastore.name, datastore.checksum, version, expires,
+    )
+
+
+def sign(payload):
+    return signing.dumps(payload, salt=SHARE_SALT, compress=True)
+
+
+def file_token(datastore, expires):
+    return sign(file_payload(datastore, key_version(datastore.user_id), expires))
+
+
+def set_token(user, filters, expires):
+    return sign({'k': 's', 'u': user.pk, 'v': key_version(user.pk), 'e': expires, 'q': filters})
+
+
+def expiry(ttl=None):
+    return int(time.time()) + min(ttl or SHARE_DEFAULT_TTL, SHARE_MAX_TTL)
+
+
+def verify(token):
+    """The token's payload if it is authentic, unexpired and not revoked."""
+    try:
+        payload = signing.loads(token, salt=SHARE_SALT)
+    except signing.BadSignature:
+        raise ShareError("Invalid share link.")
+    if payload['e'] < time.time():
+        raise ShareError("This share link has expired.", 410)
+    if payload['v'] != key_version(payload['u']):
+        raise ShareError("This share link has been revoked.", 410)
+    return payload
+
+
+def cache_max_age(payload):
+    return max(0, min(SHARE_CACHE_MAX_AGE, payload['e'] - int(time.time())))
+
+
+def share_url(request, token):
+    url = reverse('shared', args=[token])
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def set_queryset(payload):
+    filters = payload['q']
+    files = DataStore.objects.filter(user_id=payload['u'])
+    if filters.get('file_type'):
+        files = files.filter(file_type=filters['file_type'])
+    if filters.get('ids'):
+        files = files.filter(pk__in=filters['ids'])
+    if filters.get('uploaded_after'):
+        files = files.filter(uploaded_at__gte=filters['uploaded_after'])
+    if filters.get('uploaded_before'):
+        files = files.filter(uploaded_at__lt=filters['uploaded_before'])
+    return files.exclude(file='')[:SHARE_SET_LIMIT]
+
+
+def set_manifest(request, token, payload):
+    """
+    The files of a shared set with a signed link each. Built with one query
+    and then cached per token, so repeat visits skip the file query.
+    """
+    key = f"share-set:{hashlib.sha256(token.encode()).hexdigest()}"
+    manifest = cache.get(key)
+    if manifest is None:
+        files = set_queryset(payload).only('id', 'user_id', 'name', 'file', 'file_type', 'size', 'checksum')
+        manifest = {
+            'expires_at': payload['e'],
+            'files': [
+                {
+                    'id': datastore.pk,
+                    'name': datastore.name,
+                    'file_type': datastore.file_type,
+                    'size': datastore.size,
+                    'url': share_url(request, sign(file_payload(datastore, payload['v'], payload['e']))),
+                }
+                for datastore in files
+            ],
+        }
+        cache.set(key, manifest, cache_max_age(payload))
+    return manifest
@@ -0,0 +1,33 @@
+# signals.py
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Crm, DataStore, Invoice, Tombstone, User
+from .purge import blob_names, schedule_blob_removal, user_blob_names
+
+
+@receiver(post_delete, sender=Crm)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=DataStore)
+def record_tombstone(sender, instance, **kwargs):
+    # Service items are not tombstoned: /api/sync/ always sends an invoice's
+    # services in full, so clients replace them together with the invoice.
+    if sender is DataStore and instance.deleted_at is not None:
+        # Soft-deleted rows were tombstoned when they were hidden.
+        return
+    user_id = instance.created_by_id if sender is Invoice else instance.user_id
+    Tombstone.objects.create(user_id=user_id, model_name=sender._meta.model_name, object_id=instance.pk)
+
+
+@receiver(post_delete, sender=DataStore)
+def remove_datastore_files(sender, instance, **kwargs):
+    # Hard deletes that bypass api.purge, e.g. cascading from a User. HLS
+    # output is left to gc_media since the job row is already gone.
+    if instance.deleted_at is None:
+        hot, cold, _ = blob_names(instance)
+        schedule_blob_removal(hot, cold)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_files(sender, instance, **kwargs):
+    schedule_blob_removal(user_blob_names(instance))
@@ -1,3 +1,949 @@
-from django.test import TestCase
+import functools
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import urllib.error
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import avatars, events, purge, tiering, transcoding, uploads
+from .batch import BATCH_MAX_REQUESTS
+from .management.commands import bench_imports
+from .middleware import CompressionMiddleware, brotli, zstandard
+from .models import Crm, DataStore, Invoice, OutboxEvent, PhotoHash, ServiceItem, TranscodeJob, User, Webhook
+from .renderers import ORJSONRenderer
+from .serializers import InvoiceSerializer
+from .throttling import LOGIN_FREE_FAILURES
+from .views import SyncAPIView
+
+
+class AdminChangelistQueryTests(TestCase):
+    """
+    Changelists must cost a fixed number of queries however many rows the
+    page shows: session + user, the count and the page itself. Unfiltered
+    lists also read the table estimate first, which small tables then
+    replace with an exact count.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw')
+        cls.owners = User.objects.bulk_create(
+            User(email=f"owner{i}@example.com", username=f"owner{i}") for i in range(3)
+        )
+        Crm.objects.bulk_create(
+            # full_name is optional; such rows must still render.
+            Crm(user=owner, full_name=f"client {i}" if i else None, email_address=f"client{i}@{owner.pk}.example.com")
+            for owner in cls.owners for i in range(5)
+        )
+        invoices = Invoice.objects.bulk_create(
+            Invoice(
+                invoice_number=f"INV-{owner.pk}-{i}", date=date(2025, 1, 1), customer_name='Customer',
+                customer_address='Street 1', prepared_by='Staff', subtotal=100, tax_rate=10, tax_amount=10,
+                total_amount=110, created_by=owner,
+            )
+            for owner in cls.owners for i in range(5)
+        )
+        ServiceItem.objects.bulk_create(
+            ServiceItem(invoice=invoice, name='Shoot', cost=100, quantity=1, total=100) for invoice in invoices
+        )
+        DataStore.objects.bulk_create(
+            DataStore(
+                user=owner, name=f"photo{i}.jpg", file=f"datastore/2025/01/01/{owner.pk}-{i}.jpg",
+                file_type='photo', file_format='jpg', size=1024, checksum=f"{owner.pk:032d}{i:032d}",
+            )
+            for owner in cls.owners for i in range(5)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get_changelist(self, model_name, queries, **params):
+        with self.assertNumQueries(queries):
+            response = self.client.get(reverse(f'admin:api_{model_name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_user_changelist(self):
+        response = self.get_changelist('user', 5)
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+    def test_user_search(self):
+        response = self.get_changelist('user', 4, q='owner1@example.com')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_crm_changelist(self):
+        response = self.get_changelist('crm', 5)
+        self.assertEqual(response.context['cl'].result_count, 15)
+        self.assertContains(response, 'Crm #')
+
+    def test_crm_search_by_email_and_owner(self):
+        owner = self.owners[0]
+        response = self.get_changelist('crm', 4, q=f"client2@{owner.pk}.example.com")
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.get_changelist('crm', 4, q=owner.email)
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_invoice_changelist(self):
+        response = self.get_changelist('invoice', 5)
+        self.assertEqual(response.context['cl'].result_count, 15)
+
+    def test_invoice_search(self):
+        response = self.get_changelist('invoice', 4, q=f"INV-{self.owners[1].pk}-3")
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_datastore_changelist(self):
+        response = self.get_changelist('datastore', 5)
+        self.assertEqual(response.context['cl'].result_count, 15)
+
+    def test_datastore_search_by_checksum_and_owner(self):
+        owner = self.owners[2]
+        response = self.get_changelist('datastore', 4, q=f"{owner.pk:032d}{4:032d}")
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.get_changelist('datastore', 4, q=owner.email)
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_unfiltered_datastore_changelist_does_not_count(self):
+        # Pretend the table is large enough for the estimate to be used.
+        with mock.patch('api.admin.ADMIN_EXACT_COUNT_BELOW', 1), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:api_datastore_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+        self.assertEqual(len(queries), 4)
+        self.assertGreaterEqual(response.context['cl'].result_count, 15)
+
+    def test_search_still_counts_exactly(self):
+        with mock.patch('api.admin.ADMIN_EXACT_COUNT_BELOW', 1):
+            response = self.get_changelist('datastore', 4, q=self.owners[0].email)
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_mark_paid_events_match_the_api(self):
+        owner = self.owners[0]
+        api_invoice, admin_invoice = Invoice.objects.filter(created_by=owner).order_by('pk')[:2]
+        api = APIClient()
+        api.force_authenticate(owner)
+        api.post(f'/api/invoices/{api_invoice.pk}/mark_as_paid/')
+        self.client.post(reverse('admin:api_invoice_changelist'), {
+            'action': 'mark_paid', '_selected_action': [admin_invoice.pk],
+        })
+        from_api, from_admin = OutboxEvent.objects.filter(event_type='invoice.paid').order_by('pk')
+        self.assertEqual(from_admin.user_id, owner.pk)
+        self.assertEqual(set(from_api.payload), set(from_admin.payload))
+        self.assertEqual(from_admin.payload['status'], 'paid')
+        self.assertEqual(len(from_admin.payload['services']), 1)
+
+
+class AdminOutboxTests(TestCase):
+    """Admin writes emit the same outbox events as the API."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw')
+        self.owner = User.objects.create(email='owner@example.com', username='owner')
+        self.client.force_login(self.admin)
+
+    def invoice(self, number):
+        return Invoice.objects.create(
+            invoice_number=number, date=date(2025, 1, 1), customer_name='Customer', customer_address='Street 1',
+            prepared_by='Staff', subtotal=100, tax_rate=10, tax_amount=10, total_amount=110, created_by=self.owner,
+        )
+
+    def test_invoice_added_with_services(self):
+        response = self.client.post(reverse('admin:api_invoice_add'), {
+            'invoice_number': 'ADM-1', 'date': '2025-01-01', 'customer_name': 'Customer',
+            'customer_address': 'Street 1', 'prepared_by': 'Staff', 'subtotal': '100', 'tax_rate': '10',
+            'tax_amount': '10', 'total_amount': '110', 'status': 'draft', 'created_by': self.owner.pk,
+            'services-TOTAL_FORMS': '1', 'services-INITIAL_FORMS': '0',
+            'services-0-name': 'Shoot', 'services-0-cost': '100', 'services-0-quantity': '1',
+        })
+        self.assertEqual(response.status_code, 302)
+        event = OutboxEvent.objects.get()
+        invoice = Invoice.objects.get(invoice_number='ADM-1')
+        self.assertEqual((event.event_type, event.user_id, event.object_id), ('invoice.created', self.owner.pk, invoice.pk))
+        self.assertEqual(set(event.payload), set(InvoiceSerializer.Meta.fields))
+        self.assertEqual(event.payload['services'][0]['total'], '100.00')
+
+    def test_crm_changed_and_deleted(self):
+        crm = Crm.objects.create(user=self.owner, full_name='Before')
+        response = self.client.post(reverse('admin:api_crm_change', args=[crm.pk]), {
+            'full_name': 'After', 'user': self.owner.pk,
+            'created_at_0': '2025-01-01', 'created_at_1': '10:00:00',
+        })
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(reverse('admin:api_crm_delete', args=[crm.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+
+        updated, deleted = OutboxEvent.objects.order_by('pk')
+        self.assertEqual((updated.event_type, updated.payload['full_name']), ('crm.updated', 'After'))
+        self.assertEqual((deleted.event_type, deleted.user_id, deleted.payload), ('crm.deleted', self.owner.pk, {'id': crm.pk}))
+
+    def test_bulk_delete_emits_one_event_per_row(self):
+        invoices = [self.invoice('ADM-2'), self.invoice('ADM-3')]
+        self.client.post(reverse('admin:api_invoice_changelist'), {
+            'action': 'delete_selected', '_selected_action': [i.pk for i in invoices], 'post': 'yes',
+        })
+        self.assertFalse(Invoice.objects.exists())
+        self.assertEqual(
+            sorted(OutboxEvent.objects.filter(event_type='invoice.deleted').values_list('object_id', flat=True)),
+            sorted(i.pk for i in invoices),
+        )
+
+
+class SyncTests(TestCase):
+    """Interleaved writes and /api/sync/ calls, as an offline client sees them."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='sync@example.com', username='sync')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        long_ago = timezone.now() - timedelta(days=1)
+        self.crm = Crm.objects.create(user=self.user, full_name='Old client')
+        self.invoice = Invoice.objects.create(
+            invoice_number='SYNC-1', date=date(2025, 1, 1), customer_name='Customer', customer_address='Street 1',
+            prepared_by='Staff', subtotal=100, tax_rate=10, tax_amount=10, total_amount=110, created_by=self.user,
+        )
+        self.file = DataStore.objects.create(
+            user=self.user, name='old.jpg', file='datastore/2025/01/01/old.jpg', file_type='photo',
+            file_format='jpg', size=1024,
+        )
+        for model in (Crm, Invoice, DataStore):
+            model._default_manager.update(updated_at=long_ago)
+
+    def sync(self, token=None, **params):
+        response = self.client.get('/api/sync/', {'token': token, **params} if token else params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def sync_pages(self, token=None, limit=2):
+        pages = [self.sync(token, limit=limit)]
+        while pages[-1]['has_more']:
+            pages.append(self.sync(pages[-1]['token'], limit=limit))
+        return pages
+
+    def since(self, token):
+        return datetime.fromtimestamp(signing.loads(token, salt=SyncAPIView.token_salt), tz=dt_timezone.utc)
+
+    def ids(self, rows):
+        return [row['id'] for row in rows]
+
+    def test_initial_sync_returns_everything(self):
+        data = self.sync()
+        self.assertFalse(data['reset'])
+        self.assertEqual(self.ids(data['crm']), [self.crm.pk])
+        self.assertEqual(self.ids(data['invoices']), [self.invoice.pk])
+        self.assertEqual(self.ids(data['datastore']), [self.file.pk])
+
+    def test_second_sync_returns_only_the_delta(self):
+        token = self.sync()['token']
+        new = Crm.objects.create(user=self.user, full_name='New client')
+        self.invoice.status = 'sent'
+        self.invoice.save()
+
+        data = self.sync(token)
+        self.assertEqual(self.ids(data['crm']), [new.pk])
+        self.assertEqual(self.ids(data['invoices']), [self.invoice.pk])
+        self.assertEqual(data['datastore'], [])
+        self.assertEqual(data['deleted'], {'crm': [], 'invoice': [], 'datastore': []})
+
+        # Rows in the overlap are sent again (at-least-once); once they are
+        # older than that and nothing changed, the next sync is empty.
+        aged = self.since(data['token']) - timedelta(seconds=1)
+        for model in (Crm, Invoice):
+            model._default_manager.update(updated_at=aged)
+        later = self.sync(data['token'])
+        self.assertEqual(later['crm'], [])
+        self.assertEqual(later['invoices'], [])
+
+    def test_write_committed_inside_the_overlap_is_not_lost(self):
+        token = self.sync()['token']
+        since = self.since(token)
+        # A transaction that stamped its row just before the sync ran but
+        # committed after it: the overlap must bring it back.
+        late = Crm.objects.create(user=self.user, full_name='Late client')
+        Crm.objects.filter(pk=late.pk).update(updated_at=since + SyncAPIView.overlap / 2)
+        # Rows already delivered, older than the overlap, are not repeated.
+        Crm.objects.filter(pk=self.crm.pk).update(updated_at=since - timedelta(seconds=1))
+
+        self.assertEqual(self.ids(self.sync(token)['crm']), [late.pk])
+
+    def test_deletes_are_reported(self):
+        token = self.sync()['token']
+        hard_deleted = DataStore.objects.create(
+            user=self.user, name='gone.jpg', file='datastore/2025/01/01/gone.jpg', file_type='photo',
+            file_format='jpg', size=1024,
+        )
+        self.assertEqual(self.client.delete(f'/api/crm/{self.crm.pk}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/api/invoices/{self.invoice.pk}/').status_code, 204)
+        # Soft delete through the API, and a hard delete (e.g. a cascade).
+        self.assertEqual(self.client.delete(f'/api/datastore/{self.file.pk}/').status_code, 204)
+        hard_deleted_pk = hard_deleted.pk
+        hard_deleted.delete()
+
+        data = self.sync(token)
+        self.assertEqual(data['deleted']['crm'], [self.crm.pk])
+        self.assertEqual(data['deleted']['invoice'], [self.invoice.pk])
+        self.assertCountEqual(data['deleted']['datastore'], [self.file.pk, hard_deleted_pk])
+        self.assertEqual(data['crm'], [])
+        self.assertEqual(data['invoices'], [])
+        self.assertEqual(data['datastore'], [])
+
+    def test_initial_sync_is_paged(self):
+        Crm.objects.bulk_create(Crm(user=self.user, full_name=f"client {i}") for i in range(3))
+        pages = self.sync_pages(limit=2)
+        self.assertEqual([len(p['crm']) + len(p['invoices']) + len(p['datastore']) for p in pages], [2, 2, 2])
+        self.assertEqual(sorted(pk for p in pages for pk in self.ids(p['crm'])),
+                         sorted(Crm.objects.values_list('pk', flat=True)))
+        self.assertEqual([pk for p in pages for pk in self.ids(p['invoices'])], [self.invoice.pk])
+        self.assertEqual([pk for p in pages for pk in self.ids(p['datastore'])], [self.file.pk])
+        # Page payloads come from the ReadPlan and match the serializers.
+        self.assertEqual(pages[-1]['datastore'][0]['file'], f"http://testserver/media/{self.file.file.name}")
+        self.assertEqual(pages[-1]['invoices'][0]['services'], [])
+
+    def test_deletes_arrive_with_the_last_page(self):
+        token = self.sync()['token']
+        extra = Crm.objects.bulk_create(Crm(user=self.user, full_name=f"client {i}") for i in range(3))
+        self.client.delete(f'/api/invoices/{self.invoice.pk}/')
+        pages = self.sync_pages(token, limit=2)
+        self.assertEqual([p['deleted']['invoice'] for p in pages], [[]] * (len(pages) - 1) + [[self.invoice.pk]])
+        self.assertEqual(sorted(pk for p in pages for pk in self.ids(p['crm'])), sorted(c.pk for c in extra))
+
+    def test_row_changed_during_a_pass_comes_in_the_next_delta(self):
+        first = self.sync(limit=1)
+        self.assertEqual(self.ids(first['crm']), [self.crm.pk])
+        self.invoice.status = 'sent'
+        self.invoice.save()
+        rest = self.sync_pages(first['token'], limit=1)
+        # The pass is a snapshot: the invoice changed after it started.
+        self.assertEqual([pk for p in rest for pk in self.ids(p['invoices'])], [])
+        self.assertEqual(self.ids(self.sync(rest[-1]['token'])['invoices']), [self.invoice.pk])
+
+    def test_bad_limit_is_rejected(self):
+        for limit in ('0', '-1', 'x'):
+            self.assertEqual(self.client.get('/api/sync/', {'limit': limit}).status_code, 400, limit)
+
+    def test_invalid_tokens_are_rejected(self):
+        token = self.sync()['token']
+        for bad in (token[:-2] + ('AA' if not token.endswith('AA') else 'BB'), 'not-a-token',
+                    signing.dumps('yesterday', salt=SyncAPIView.token_salt),
+                    signing.dumps(10 ** 20, salt=SyncAPIView.token_salt),
+                    signing.dumps({'s': None, 'u': 'soon', 'p': 0, 'c': None}, salt=SyncAPIView.token_salt)):
+            response = self.client.get('/api/sync/', {'token': bad})
+            self.assertEqual(response.status_code, 400, bad)
+
+    def test_token_older_than_tombstone_retention_resets(self):
+        old = timezone.now() - timedelta(days=SyncAPIView.tombstone_days + 1)
+        token = signing.dumps(old.timestamp(), salt=SyncAPIView.token_salt)
+        data = self.sync(token)
+        self.assertTrue(data['reset'])
+        self.assertEqual(self.ids(data['crm']), [self.crm.pk])
+        self.assertEqual(self.ids(data['datastore']), [self.file.pk])
+
+
+class EventFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='events@example.com', username='events')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_limit_must_be_positive(self):
+        for limit in ('0', '-5'):
+            response = self.client.get('/api/events/', {'limit': limit})
+            self.assertEqual(response.status_code, 400, limit)
+        self.assertEqual(self.client.get('/api/events/', {'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/events/', {'limit': '1'}).status_code, 200)
+
+
+def resolves_to(address):
+    return mock.patch('api.events.socket.getaddrinfo', return_value=[(2, 1, 6, '', (address, 443))])
+
+
+class WebhookTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='hooks@example.com', username='hooks')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def webhook(self, **fields):
+        return Webhook.objects.create(user=self.user, url='https://hooks.example.com/in', secret='s3cret', **fields)
+
+    def settled_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/crm/', {'full_name': 'Client'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        OutboxEvent.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        return OutboxEvent.objects.get()
+
+    def test_registration_requires_https_to_a_public_host(self):
+        cases = [
+            ('http://hooks.example.com/in', '93.184.216.34', 400),
+            ('https://hooks.example.com/in', '169.254.169.254', 400),
+            ('https://hooks.example.com/in', '127.0.0.1', 400),
+            ('https://hooks.example.com/in', '10.1.2.3', 400),
+            ('https://hooks.example.com/in', '::ffff:192.168.0.1', 400),
+            ('https://hooks.example.com/in', '93.184.216.34', 201),
+        ]
+        for url, address, expected in cases:
+            with resolves_to(address):
+                response = self.client.post('/api/webhooks/', {'url': url}, format='json')
+            self.assertEqual(response.status_code, expected, (url, address))
+
+    def test_event_is_written_with_the_change_or_not_at_all(self):
+        self.settled_event()
+        self.assertEqual(Crm.objects.count(), 1)
+        with mock.patch('api.views.record_event', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/crm/', {'full_name': 'Lost'}, format='json')
+        self.assertEqual(Crm.objects.count(), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_delivery_is_signed_and_advances_the_cursor(self):
+        event = self.settled_event()
+        webhook = self.webhook()
+        response = mock.MagicMock(status=204)
+        response.__enter__.return_value = response
+        with resolves_to('93.184.216.34'), mock.patch('api.events._opener.open', return_value=response) as post:
+            self.assertEqual(events.deliver_pending(), 1)
+
+        request = post.call_args.args[0]
+        timestamp = request.get_header('X-webhook-timestamp')
+        expected = hmac.new(b's3cret', f"{timestamp}.".encode() + request.data, hashlib.sha256).hexdigest()
+        self.assertEqual(request.get_header('X-webhook-signature'), f"sha256={expected}")
+        self.assertEqual(json.loads(request.data)['events'][0]['id'], event.id)
+        webhook.refresh_from_db()
+        self.assertEqual((webhook.last_event_id, webhook.failure_count), (event.id, 0))
+
+    def test_failures_back_off_exponentially(self):
+        self.settled_event()
+        webhook = self.webhook()
+        failing = mock.patch('api.events._opener.open', side_effect=urllib.error.URLError('down'))
+        for failures in (1, 2, 3):
+            Webhook.objects.filter(pk=webhook.pk).update(next_attempt_at=timezone.now())
+            before = timezone.now()
+            with resolves_to('93.184.216.34'), failing:
+                self.assertEqual(events.deliver_pending(), 0)
+            webhook.refresh_from_db()
+            self.assertEqual(webhook.failure_count, failures)
+            self.assertAlmostEqual((webhook.next_attempt_at - before).total_seconds(), 2 ** failures, delta=1)
+        self.assertEqual(webhook.last_event_id, 0)
+
+    def test_delivery_rechecks_the_host(self):
+        self.settled_event()
+        webhook = self.webhook()
+        with resolves_to('127.0.0.1'), mock.patch('api.events._opener.open') as post:
+            events.deliver_pending()
+        post.assert_not_called()
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.failure_count, 1)
+
+    def test_a_claimed_webhook_is_not_claimed_again(self):
+        webhook = self.webhook(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(events.claim_webhook(webhook))
+        self.assertIsNone(events.claim_webhook(webhook))
+        self.assertEqual(events.deliver_pending(), 0)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='batch@example.com', username='batch')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+
+    def batch(self, *requests, status=200):
+        response = self.client.post('/api/batch/', {'requests': list(requests)}, format='json')
+        self.assertEqual(response.status_code, status, getattr(response, 'data', None))
+        return response.data
+
+    def test_entries_run_as_the_batch_user(self):
+        Crm.objects.create(user=self.user, full_name='Mine')
+        Crm.objects.create(user=User.objects.create(email='other@example.com', username='other'), full_name='Theirs')
+        result = self.batch({'path': '/api/crm/'}, {'path': '/api/users/0/'})['responses']
+        self.assertEqual([crm['full_name'] for crm in result[0]['body']], ['Mine'])
+        self.assertEqual(result[1]['body']['email'], 'batch@example.com')
+
+    def test_unauthenticated_batch_is_rejected(self):
+        response = APIClient().post('/api/batch/', {'requests': [{'path': '/api/crm/'}]}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(APIClient().get('/api/crm/').status_code, 401)
+
+    def test_only_api_paths_that_can_be_batched(self):
+        result = self.batch({'path': '/admin/'}, {'path': '/api/no-such-thing/'}, {'path': '/api/batch/'})['responses']
+        self.assertEqual([entry['status'] for entry in result], [404, 404, 400])
+
+    def test_entries_see_earlier_writes(self):
+        result = self.batch(
+            {'method': 'POST', 'path': '/api/crm/', 'body': {'full_name': 'New'}},
+            {'path': '/api/crm/'},
+        )['responses']
+        self.assertEqual(result[0]['status'], 201)
+        self.assertEqual([crm['id'] for crm in result[1]['body']], [result[0]['body']['id']])
+
+    def test_request_limit(self):
+        self.batch(*[{'path': '/api/crm/'}] * BATCH_MAX_REQUESTS)
+        errors = self.batch(*[{'path': '/api/crm/'}] * (BATCH_MAX_REQUESTS + 1), status=400)
+        self.assertIn('requests', errors)
+
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', (64, 64), color)
+    ImageDraw.Draw(image).rectangle((0, 0, 31, 63), fill=(255 - color[0], 255 - color[1], 255 - color[2]))
+    image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+# Enough of an MP4 header for the magic-byte check.
+MP4_BYTES = b'\x00\x00\x00\x20ftypisom\x00\x00\x02\x00isomiso2avc1mp41' + b'\x00' * 64
+
+
+def bmp_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), (1, 2, 3)).save(buffer, 'BMP')
+    return buffer.getvalue()
+
+
+class SniffTests(SimpleTestCase):
+    def test_signatures(self):
+        riff = b'RIFF\x24\x00\x00\x00'
+        cases = [
+            (jpeg_bytes((1, 2, 3)), 'jpg'),
+            (bmp_bytes(), 'bmp'),
+            (riff + b'WEBPVP8 ' + b'\x00' * 16, 'webp'),
+            (riff + b'AVI LIST' + b'\x00' * 16, 'avi'),
+            (MP4_BYTES, 'mp4'),
+            (b'BM, a text file that happens to start with BM', None),
+            (b'BM' + bmp_bytes()[2:14] + struct.pack('<I', 99) + b'\x00' * 14, None),
+            (b'JUNK\x24\x00\x00\x00WEBPVP8 ' + b'\x00' * 16, None),
+            (riff + b'WAVEfmt ' + b'\x00' * 16, None),
+        ]
+        for head, expected in cases:
+            detected = uploads.sniff(head[:uploads.SNIFF_BYTES])
+            self.assertEqual(detected and detected[2], expected, head[:16])
+
+
+class UploadLimitTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.staging = os.path.join(media_root, 'datastore', '.incoming')
+        for patcher in (
+            mock.patch('api.uploads.UPLOAD_STAGING_DIR', self.staging),
+            mock.patch('api.views.StreamingUploadHandler',
+                       functools.partial(uploads.StreamingUploadHandler, max_size=4096)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email='limits@example.com', username='limits')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content):
+        data = {'name': 'f', 'file': SimpleUploadedFile('f.bin', content)}
+        return self.client.post('/api/datastore/', data, format='multipart')
+
+    def test_bmp_accepted(self):
+        response = self.upload(bmp_bytes())
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['file_type'], response.data['file_format']), ('photo', 'bmp'))
+
+    def test_rejections_leave_nothing_behind(self):
+        cases = [
+            (bmp_bytes()[:-10], 415),  # shorter than its header says
+            (b'BM' + b'x' * 100, 415),
+            (b'RIFF\x24\x00\x00\x00WAVEfmt ' + b'\x00' * 100, 415),
+            (jpeg_bytes((1, 2, 3)) + b'\x00' * 4096, 413),
+        ]
+        for content, status_code in cases:
+            self.assertEqual(self.upload(content).status_code, status_code, content[:16])
+        self.assertFalse(DataStore.objects.exists())
+        self.assertEqual(os.listdir(self.staging), [])
+
+
+class FileReplacementTests(TestCase):
+    """Replacing a DataStore file must drop what was derived from the old one."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        staging = mock.patch('api.uploads.UPLOAD_STAGING_DIR', os.path.join(media_root, 'datastore', '.incoming'))
+        staging.start()
+        self.addCleanup(staging.stop)
+        self.media_root = media_root
+        self.user = User.objects.create(email='replace@example.com', username='replace')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content, pk=None):
+        data = {'name': name, 'file': SimpleUploadedFile(name, content)}
+        if pk is None:
+            response = self.client.post('/api/datastore/', data, format='multipart')
+        else:
+            response = self.client.patch(f'/api/datastore/{pk}/', data, format='multipart')
+        self.assertIn(response.status_code, (200, 201), getattr(response, 'data', None))
+        return response.data
+
+    def test_photo_replaced_by_video_loses_its_hash(self):
+        photo = self.upload('a.jpg', jpeg_bytes((200, 30, 30)))
+        self.assertTrue(PhotoHash.objects.filter(datastore_id=photo['id']).exists())
+
+        replaced = self.upload('a.mp4', MP4_BYTES, pk=photo['id'])
+        self.assertEqual(replaced['file_type'], 'video')
+        self.assertEqual(replaced['transcode_status'], 'queued')
+        self.assertFalse(PhotoHash.objects.filter(datastore_id=photo['id']).exists())
+
+    def test_photo_replaced_by_unreadable_image_loses_its_hash(self):
+        photo = self.upload('a.jpg', jpeg_bytes((30, 200, 30)))
+        self.upload('b.jpg', b'\xff\xd8\xff' + b'\x00' * 64, pk=photo['id'])
+        self.assertFalse(PhotoHash.objects.filter(datastore_id=photo['id']).exists())
+
+    def test_video_replaced_by_photo_drops_its_transcode(self):
+        video = self.upload('v.mp4', MP4_BYTES)
+        output_dir = os.path.join('hls', str(video['id']), 'abcd1234')
+        os.makedirs(os.path.join(self.media_root, output_dir))
+        with open(os.path.join(self.media_root, output_dir, 'master.m3u8'), 'w') as fh:
+            fh.write('#EXTM3U\n')
+        TranscodeJob.objects.filter(datastore_id=video['id']).update(status='done', output_dir=output_dir)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            replaced = self.upload('p.jpg', jpeg_bytes((30, 30, 200)), pk=video['id'])
+        purge._executor.submit(lambda: None).result()  # wait for the background removal
+
+        self.assertEqual(replaced['file_type'], 'photo')
+        self.assertIsNone(replaced['transcode_status'])
+        self.assertFalse(TranscodeJob.objects.filter(datastore_id=video['id']).exists())
+        self.assertEqual(self.client.get(f"/api/datastore/{video['id']}/hls/master.m3u8").status_code, 404)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, output_dir)))
+        self.assertTrue(PhotoHash.objects.filter(datastore_id=video['id']).exists())
+
+
+class ColdTierTests(TestCase):
+    """Cold files are listed with a working URL, and only real reads count as access."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cold = mock.patch('api.tiering.cold_storage', FileSystemStorage(location=os.path.join(media_root, 'cold')))
+        cold.start()
+        self.addCleanup(cold.stop)
+        self.user = User.objects.create(email='cold@example.com', username='cold')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.datastore = DataStore.objects.create(
+            user=self.user, name='old.jpg', file=SimpleUploadedFile('old.jpg', jpeg_bytes((90, 90, 90))),
+        )
+        self.assertTrue(tiering.demote(self.datastore))
+        # Keep marks in memory for the whole test instead of flushing them.
+        tracker = mock.patch('api.tiering.access_tracker', tiering.AccessTracker(interval=3600))
+        tracker.start()
+        self.addCleanup(tracker.stop)
+
+    def test_listings_point_cold_files_at_the_download_endpoint(self):
+        download = f"http://testserver/api/datastore/{self.datastore.pk}/download/"
+        for path in ('/api/datastore/', '/api/datastore/photos/'):
+            self.assertEqual(self.client.get(path).data[0]['file'], download)
+        self.assertEqual(self.client.get('/api/sync/').data['datastore'][0]['file'], download)
+        self.assertEqual(tiering.access_tracker.pending, set())
+
+        response = self.client.get(download)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), jpeg_bytes((90, 90, 90)))
+        self.assertEqual(tiering.access_tracker.pending, {self.datastore.pk})
+
+    def test_revoking_shares_leaves_listings_working(self):
+        self.client.post('/api/datastore/revoke_shares/')
+        url = self.client.get('/api/datastore/').data[0]['file']
+        self.assertEqual(self.client.get(url).status_code, 200)
+        anonymous = APIClient()
+        self.assertEqual(anonymous.get(url).status_code, 401)
+
+
+class TranscodePlanTests(SimpleTestCase):
+    def probe(self, width, height, audio=True):
+        streams = [{'codec_type': 'video', 'width': width, 'height': height}]
+        if audio:
+            streams.append({'codec_type': 'audio'})
+        completed = mock.Mock(stdout=json.dumps({'streams': streams}).encode())
+        with mock.patch('api.transcoding.subprocess.run', return_value=completed):
+            return transcoding.probe('in.mp4')
+
+    def test_rungs_above_the_source_are_skipped(self):
+        renditions = transcoding.plan_renditions(self.probe(854, 480))
+        self.assertEqual([(r['name'], r['width'], r['height']) for r in renditions],
+                         [('480p', 854, 480), ('360p', 640, 360)])
+
+    def test_small_source_gets_one_rendition_at_its_own_size(self):
+        renditions = transcoding.plan_renditions(self.probe(320, 240, audio=False))
+        self.assertEqual([(r['name'], r['width'], r['height'], r['audio_kbps']) for r in renditions],
+                         [('360p', 320, 240, 0)])
+
+    def test_master_playlist_describes_the_real_streams(self):
+        renditions = transcoding.plan_renditions(self.probe(1920, 1080))
+        master = transcoding.master_playlist('abcd1234', renditions)
+        self.assertIn('BANDWIDTH=5542000,AVERAGE-BANDWIDTH=5192000,RESOLUTION=1920x1080,'
+                      'CODECS="avc1.4d4028,mp4a.40.2",NAME="1080p"', master)
+        self.assertIn('RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"', master)
+        self.assertEqual(master.count('#EXT-X-STREAM-INF'), 4)
+
+    def test_keyframes_follow_segment_time_not_frame_count(self):
+        rendition = transcoding.plan_renditions(self.probe(1280, 720, audio=False))[0]
+        args = transcoding.ffmpeg_rendition_args('in.mp4', 'out', 'abcd1234', rendition)
+        self.assertIn(f"expr:gte(t,n_forced*{transcoding.HLS_SEGMENT_SECONDS})", args)
+        self.assertNotIn('-g', args)
+        self.assertNotIn('-c:a', args)
+
+
+class RendererParityTests(SimpleTestCase):
+    def test_orjson_output_matches_drf(self):
+        data = {
+            'aware': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'offset': datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt_timezone(timedelta(hours=2))),
+            'naive': datetime(2025, 1, 2, 3, 4, 5, 600000),
+            'date': date(2025, 1, 2),
+            'time': dt_time(3, 4, 5, 123456),
+            'decimal': Decimal('12.50'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'text': 'caf\u00e9 \u2028 \u2029',
+            1: [None, True, 1.5, {'nested': 'x'}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps([{'id': i, 'name': f"photo {i}.jpg"} for i in range(200)]).encode()
+
+    def respond(self, accept_encoding=None, content=None, content_type='application/json'):
+        request = RequestFactory().get('/', **({'HTTP_ACCEPT_ENCODING': accept_encoding} if accept_encoding else {}))
+        middleware = CompressionMiddleware(lambda request: HttpResponse(content or self.body, content_type=content_type))
+        return middleware(request)
+
+    def decoded(self, response):
+        decompress = {
+            'gzip': gzip.decompress,
+            'br': brotli.decompress,
+            'zstd': lambda data: zstandard.ZstdDecompressor().decompress(data),
+        }[response['Content-Encoding']]
+        return decompress(response.content)
+
+    @skipUnless(brotli and zstandard, "brotli and zstandard are optional")
+    def test_negotiation(self):
+        cases = [
+            ('gzip', 'gzip'),
+            ('br', 'br'),
+            ('zstd', 'zstd'),
+            ('gzip, br, zstd', 'zstd'),
+            ('gzip, br', 'br'),
+            ('gzip;q=1.0, br;q=0.5', 'gzip'),
+            ('br;q=0, gzip', 'gzip'),
+        ]
+        for accept_encoding, expected in cases:
+            response = self.respond(accept_encoding)
+            self.assertEqual(response['Content-Encoding'], expected, accept_encoding)
+            self.assertEqual(self.decoded(response), self.body)
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_left_alone(self):
+        self.assertFalse(self.respond().has_header('Content-Encoding'))
+        self.assertFalse(self.respond('identity').has_header('Content-Encoding'))
+        self.assertFalse(self.respond('br', content=self.body[:100]).has_header('Content-Encoding'))
+        for content_type in ('image/jpeg', 'video/mp4', 'application/zip'):
+            response = self.respond('gzip, br, zstd', content_type=content_type)
+            self.assertFalse(response.has_header('Content-Encoding'), content_type)
+            self.assertEqual(response.content, self.body)
+
+    def test_minimum_size_is_a_setting(self):
+        self.assertFalse(self.respond('gzip', content=self.body[:400]).has_header('Content-Encoding'))
+        with self.settings(COMPRESSION_MIN_SIZE=256):
+            self.assertEqual(self.respond('gzip', content=self.body[:400])['Content-Encoding'], 'gzip')
+
+
+# A fast hasher: these tests are about counting attempts, not hashing them.
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginBackoffTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        User.objects.create_user(email='alice@example.com', username='alice', password='right-password')
+        User.objects.create_user(email='bob@example.com', username='bob', password='right-password')
+
+    def login(self, email, password, ip='192.0.2.1'):
+        return APIClient(REMOTE_ADDR=ip).post('/api/login/', {'email': email, 'password': password}, format='json')
+
+    def fail_login(self, times, email='alice@example.com', ip='192.0.2.1'):
+        for _ in range(times):
+            self.assertEqual(self.login(email, 'wrong-password', ip).status_code, 401)
+
+    def test_backoff_after_free_failures(self):
+        self.fail_login(LOGIN_FREE_FAILURES + 1)
+        response = self.login('alice@example.com', 'right-password')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_lockout_does_not_reach_other_addresses(self):
+        self.fail_login(LOGIN_FREE_FAILURES + 1, ip='203.0.113.9')
+        self.assertEqual(self.login('alice@example.com', 'right-password').status_code, 200)
+
+    def test_success_resets_the_count(self):
+        self.fail_login(LOGIN_FREE_FAILURES)
+        self.assertEqual(self.login('alice@example.com', 'right-password').status_code, 200)
+        # Without the reset the first of these would start a lockout.
+        self.fail_login(2)
+
+    def test_failures_of_users_behind_one_address_do_not_add_up(self):
+        for i in range(LOGIN_FREE_FAILURES + 2):
+            self.fail_login(1, email=f"someone{i}@example.com")
+        self.assertEqual(self.login('bob@example.com', 'right-password').status_code, 200)
+
+
+class ShareLinkTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create(email='share@example.com', username='share')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.content = jpeg_bytes((10, 120, 240))
+        self.datastore = DataStore.objects.create(
+            user=self.user, name='shared.jpg', file=SimpleUploadedFile('shared.jpg', self.content),
+        )
+
+    def share(self, **data):
+        response = self.client.post(f'/api/datastore/{self.datastore.pk}/share/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        # Rendered like every other DRF datetime.
+        self.assertRegex(response.json()['expires_at'], r'T\d\d:\d\d:\d\dZ$')
+        return response.data['url']
+
+    def test_link_serves_the_file_without_authentication(self):
+        response = APIClient().get(self.share(expires_in=600))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertTrue(response['Cache-Control'].startswith('public, max-age='))
+
+    def test_tampered_link_is_rejected(self):
+        url = self.share()
+        token = url.rstrip('/').rsplit('/', 1)[1]
+        forged = token[:-1] + ('A' if token[-1] != 'A' else 'B')
+        response = APIClient().get(url.replace(token, forged))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error'], 'Invalid share link.')
+
+    def test_expired_link_is_gone(self):
+        url = self.share(expires_in=60)
+        with mock.patch('api.sharing.time.time', return_value=time.time() + 61):
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, 410)
+
+    def test_revoke_reaches_every_worker(self):
+        url = self.share()
+        self.assertEqual(self.client.post('/api/datastore/revoke_shares/').status_code, 200)
+        self.assertEqual(APIClient().get(url).status_code, 410)
+        # A revoke made by another process only touches the database.
+        url = self.share()
+        User.objects.filter(pk=self.user.pk).update(share_key_version=F('share_key_version') + 1)
+        self.assertEqual(APIClient().get(url).status_code, 410)
+
+    def test_set_link_lists_signed_file_links(self):
+        response = self.client.post('/api/datastore/share/', {'file_type': 'photo'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        manifest = APIClient().get(response.data['url']).data
+        self.assertEqual([item['id'] for item in manifest['files']], [self.datastore.pk])
+        self.assertEqual(APIClient().get(manifest['files'][0]['url']).status_code, 200)
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create(email='avatar@example.com', username='avatar')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def set_photo(self, color):
+        # Processing runs inline here; the background pool is for requests.
+        with mock.patch('api.views.schedule_avatar_processing'), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/users/{self.user.pk}/', {
+                'profile_photo': SimpleUploadedFile('me.jpg', jpeg_bytes(color), content_type='image/jpeg'),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        purge._executor.submit(lambda: None).result()
+        avatars.process_avatar(self.user.pk)
+        self.user.refresh_from_db()
+        return self.user.avatar_renditions
+
+    def files(self, renditions):
+        return [name for files in renditions.values() for name in files.values()]
+
+    def test_new_photo_gets_new_rendition_urls(self):
+        first = self.set_photo((200, 30, 30))
+        self.assertTrue(all(default_storage.exists(name) for name in self.files(first)))
+
+        second = self.set_photo((30, 30, 200))
+        self.assertFalse(set(self.files(first)) & set(self.files(second)))
+        self.assertTrue(all(default_storage.exists(name) for name in self.files(second)))
+        self.assertFalse(any(default_storage.exists(name) for name in self.files(first)))
+
+    def test_reprocessing_replaces_the_previous_set(self):
+        first = self.set_photo((30, 200, 30))
+        avatars.process_avatar(self.user.pk)
+        self.user.refresh_from_db()
+        self.assertNotEqual(self.user.avatar_renditions, first)
+        self.assertFalse(any(default_storage.exists(name) for name in self.files(first)))
+
+
+class WorkerStartupImportTests(SimpleTestCase):
+    """
+    A fresh API worker must leave the deferred modules unimported and not
+    grow much past the module count in api/import_baseline.json (refresh it
+    with ``manage.py bench_imports --save`` when an import is added on purpose).
+    """
+    BASELINE = os.path.join(os.path.dirname(__file__), 'import_baseline.json')
+
+    def test_api_worker_startup_imports(self):
+        with open(self.BASELINE) as fh:
+            baseline = json.load(fh)
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'backend.settings_api', 'PYTHONDONTWRITEBYTECODE': '1'}
+        _, rows = bench_imports.Command().run_once(env)
+        imported = {name for name, _ in rows}
+
+        self.assertEqual(sorted(m for m in bench_imports.DEFERRED_MODULES if m in imported), [])
+        self.assertLessEqual(len(imported), baseline['modules'] * 1.2)
@@ -0,0 +1,148 @@
+# throttling.py
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+# Failed logins for one email from one IP allowed before backoff starts, and
+# the cap on a single lockout.
+LOGIN_FREE_FAILURES = getattr(settings, 'LOGIN_FREE_FAILURES', 5)
+LOGIN_MAX_LOCKOUT = getattr(settings, 'LOGIN_MAX_LOCKOUT', 15 * 60)
+LOGIN_FAILURE_WINDOW = getattr(settings, 'LOGIN_FAILURE_WINDOW', 24 * 3600)
+
+
+def incr(cache, key, timeout):
+    """Atomically increment a cache counter, creating it if missing."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr().
+        cache.set(key, 1, timeout)
+        return 1
+
+
+def email_ident(request):
+    try:
+        email = request.data.get('email')
+    except Exception:
+        # Unparseable bodies are rejected by the view itself.
+        return None
+    if not isinstance(email, str) or not email.strip():
+        return None
+    # Hashed so arbitrary user input never ends up in a cache key.
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Rate limit backed by atomic cache counters instead of the timestamp list
+    SimpleRateThrottle keeps, so concurrent workers cannot race past the
+    limit. The current and previous fixed windows are blended to approximate
+    a token bucket refilling at ``num_requests / duration``.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window = int(now // self.duration)
+        elapsed = (now % self.duration) / self.duration
+        previous = self.cache.get(f"{self.key}:{window - 1}", 0)
+        current = incr(self.cache, f"{self.key}:{window}", self.duration * 2)
+
+        estimated = previous * (1 - elapsed) + current
+        if estimated <= self.num_requests:
+            return True
+        self.wait_time = self.duration * (1 - elapsed)
+        return False
+
+    def wait(self):
+        return getattr(self, 'wait_time', None)
+
+
+class AuthIPThrottle(SlidingWindowThrottle):
+    scope = 'auth_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class AuthEmailThrottle(SlidingWindowThrottle):
+    scope = 'auth_email'
+
+    def get_cache_key(self, request, view):
+        ident = email_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginBackoffThrottle(BaseThrottle):
+    """
+    Rejects logins for an email from an IP that is serving a backoff penalty.
+    This is a single cache read, so locked-out attempts never reach the
+    password hasher.
+
+    Penalties are keyed on the (email, IP) pair: an attacker cannot lock a
+    known account out for everyone else, and users sharing a NAT address do
+    not pile failures onto each other. The per-IP and per-email rate limits
+    (AuthIPThrottle, AuthEmailThrottle) bound guessing across pairs.
+    """
+    cache = default_cache
+    timer = time.time
+
+    def allow_request(self, request, view):
+        ident = login_ident(request)
+        if ident is None:
+            return True
+        locked_until = self.cache.get(lockout_key(ident), 0)
+        now = self.timer()
+        if locked_until > now:
+            self.wait_time = locked_until - now
+            return False
+        return True
+
+    def wait(self):
+        return getattr(self, 'wait_time', None)
+
+
+def login_ident(request):
+    email = email_ident(request)
+    if email is None:
+        return None
+    ip = LoginBackoffThrottle().get_ident(request)
+    return hashlib.sha256(f"{ip}|{email}".encode()).hexdigest()
+
+
+def lockout_key(ident):
+    return f"auth_lock_{ident}"
+
+
+def failure_key(ident):
+    return f"auth_fail_{ident}"
+
+
+def register_login_failure(request):
+    """Count a failed login and apply exponential backoff once over the limit."""
+    ident = login_ident(request)
+    if ident is None:
+        return
+    throttle = LoginBackoffThrottle()
+    failures = incr(throttle.cache, failure_key(ident), LOGIN_FAILURE_WINDOW)
+    if failures > LOGIN_FREE_FAILURES:
+        penalty = min(2 ** (failures - LOGIN_FREE_FAILURES), LOGIN_MAX_LOCKOUT)
+        throttle.cache.set(lockout_key(ident), throttle.timer() + penalty, penalty)
+
+
+def reset_login_failures(request):
+    ident = login_ident(request)
+    if ident is not None:
+        LoginBackoffThrottle.cache.delete_many([failure_key(ident), lockout_key(ident)])
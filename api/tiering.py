@@ -0,0 +1,189 @@
+# tiering.py
+import atexit
+import gzip
+import os
+import shutil
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DataStore
+
+COLD_STORAGE_ROOT = getattr(settings, 'COLD_STORAGE_ROOT', os.path.join(settings.BASE_DIR, 'cold_media'))
+# Gzip blobs on the way to cold storage. Worth it for RAW/TIFF/uncompressed
+# video; JPEG and H.264 barely shrink, so it is off by default.
+COLD_STORAGE_COMPRESS = getattr(settings, 'COLD_STORAGE_COMPRESS', False)
+TIERING_IDLE_DAYS = getattr(settings, 'TIERING_IDLE_DAYS', 180)
+# Reads only mark rows in memory; the marks are written in one UPDATE at most
+# this often per process.
+ACCESS_FLUSH_SECONDS = getattr(settings, 'ACCESS_FLUSH_SECONDS', 60)
+COPY_BUFFER_SIZE = 1024 * 1024
+
+cold_storage = FileSystemStorage(location=COLD_STORAGE_ROOT, base_url=None)
+
+
+def idle_candidates(days=TIERING_IDLE_DAYS):
+    """Hot rows neither read nor uploaded in the last ``days`` days."""
+    cutoff = timezone.now() - timedelta(days=days)
+    return DataStore.objects.filter(storage_tier='hot').exclude(file='').filter(
+        Q(last_accessed_at__lt=cutoff) | Q(last_accessed_at__isnull=True, uploaded_at__lt=cutoff)
+    )
+
+
+def _copy(source, target):
+    shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+    target.flush()
+    os.fsync(target.fileno())
+
+
+def demote(datastore):
+    """
+    Move a hot blob to cold storage and leave a pointer (cold_name) in the row.
+    Returns False if the row changed underneath us, in which case the cold copy
+    is discarded and the hot file left alone.
+    """
+    name = datastore.file.name
+    cold_name = name + '.gz' if COLD_STORAGE_COMPRESS else name
+    target_path = cold_storage.path(cold_name)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    with datastore.file.storage.open(name, 'rb') as source:
+        if COLD_STORAGE_COMPRESS:
+            with open(target_path, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+                raw.flush()
+                os.fsync(raw.fileno())
+        else:
+            with open(target_path, 'wb') as target:
+                _copy(source, target)
+
+    # Compare-and-swap on the file name: an upload replacing the file while we
+    # copied wins.
+    moved = DataStore.objects.filter(pk=datastore.pk, storage_tier='hot', file=name).update(
+        storage_tier='cold', cold_name=cold_name
+    )
+    if not moved:
+        cold_storage.delete(cold_name)
+        return False
+    datastore.file.storage.delete(name)
+    datastore.storage_tier, datastore.cold_name = 'cold', cold_name
+    return True
+
+
+def open_cold(datastore):
+    """Readable binary stream of a cold blob, decompressing transparently."""
+    # Compressed blobs are stored under the original name plus '.gz'.
+    if datastore.cold_name != datastore.file.name:
+        return gzip.open(cold_storage.path(datastore.cold_name), 'rb')
+    return cold_storage.open(datastore.cold_name, 'rb')
+
+
+def open_blob(datastore):
+    """Readable binary stream of the file, from whichever tier holds it."""
+    if datastore.storage_tier == 'cold':
+        return open_cold(datastore)
+    return datastore.file.open('rb')
+
+
+def open_by_name(name):
+    """
+    Open a DataStore blob knowing only its file name, trying the hot tier and
+    then cold storage (plain or gzipped). Used where no row is loaded.
+    """
+    try:
+        return default_storage.open(name, 'rb')
+    except FileNotFoundError:
+        pass
+    try:
+        return cold_storage.open(name, 'rb')
+    except FileNotFoundError:
+        return gzip.open(cold_storage.path(name + '.gz'), 'rb')
+
+
+def restore(datastore):
+    """Bring a cold blob back to its original hot location."""
+    if datastore.storage_tier != 'cold':
+        return True
+    name, cold_name = datastore.file.name, datastore.cold_name
+    target_path = datastore.file.storage.path(name)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    # Write next to the final location and rename, so readers never see a
+    # partial file and concurrent restores of the same row do not interleave.
+    partial = f"{target_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open_cold(datastore) as source, open(partial, 'wb') as target:
+            _copy(source, target)
+        os.replace(partial, target_path)
+    except FileNotFoundError:
+        if os.path.exists(partial):
+            os.remove(partial)
+        # Another request restored it first and removed the cold copy.
+        datastore.refresh_from_db(fields=['storage_tier', 'cold_name'])
+        if datastore.storage_tier == 'hot':
+            return False
+        raise
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    restored = DataStore.objects.filter(pk=datastore.pk, storage_tier='cold', cold_name=cold_name).update(
+        storage_tier='hot', cold_name='', last_accessed_at=timezone.now()
+    )
+    if restored:
+        cold_storage.delete(cold_name)
+    datastore.storage_tier, datastore.cold_name = 'hot', ''
+    return bool(restored)
+
+
+class AccessTracker:
+    """
+    Collects the ids of DataStore rows read by this process and writes their
+    access time in a single UPDATE per flush interval, instead of one write per
+    read. Precision is bounded by the interval, which is plenty for a policy
+    measured in days.
+    """
+
+    def __init__(self, interval=ACCESS_FLUSH_SECONDS):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.last_flush = time.monotonic()
+
+    def touch(self, *ids):
+        with self.lock:
+            self.pending.update(ids)
+            due = time.monotonic() - self.last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            ids, self.pending = self.pending, set()
+            self.last_flush = time.monotonic()
+        if ids:
+            DataStore.objects.filter(pk__in=ids).update(last_accessed_at=timezone.now())
+        return len(ids)
+
+
+access_tracker = AccessTracker()
+
+
+def record_access(*ids):
+    access_tracker.touch(*ids)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        access_tracker.flush()
+    except Exception:
+        # The database may already be gone at interpreter shutdown; losing a
+        # minute of access marks only delays demotion.
+        pass
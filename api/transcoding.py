@@ -0,0 +1,237 @@
+# transcoding.py
+import json
+import logging
+import os
+import shutil
+import subprocess
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import tiering
+from .models import TranscodeJob
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BINARY = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+FFMPEG_THREADS = getattr(settings, 'FFMPEG_THREADS', 2)
+TRANSCODE_MAX_ATTEMPTS = getattr(settings, 'TRANSCODE_MAX_ATTEMPTS', 3)
+TRANSCODE_TIMEOUT = getattr(settings, 'TRANSCODE_TIMEOUT', 2 * 3600)
+HLS_SEGMENT_SECONDS = getattr(settings, 'HLS_SEGMENT_SECONDS', 6)
+# (name, height, video kbps, audio kbps), highest first. Rungs above the
+# source's height are skipped; a source below the lowest rung gets that rung
+# alone, at its own height.
+HLS_LADDER = getattr(settings, 'HLS_LADDER', [
+    ('1080p', 1080, 5000, 192),
+    ('720p', 720, 2800, 128),
+    ('480p', 480, 1400, 128),
+    ('360p', 360, 800, 96),
+])
+# Peak rate allowed by -maxrate, relative to the target video bitrate.
+HLS_MAXRATE_FACTOR = 1.07
+# H.264 Main profile levels (and their CODECS tag) by maximum frame height.
+H264_LEVELS = [(480, '3.0', 'avc1.4d401e'), (720, '3.1', 'avc1.4d401f'), (1080, '4.0', 'avc1.4d4028')]
+AAC_CODEC = 'mp4a.40.2'
+
+
+def enqueue(datastore):
+    """Queue (or re-queue, after the file was replaced) a transcode for a video."""
+    job, created = TranscodeJob.objects.get_or_create(datastore=datastore)
+    if not created:
+        TranscodeJob.objects.filter(pk=job.pk).update(status='queued', attempts=0, error='')
+    return job
+
+
+def requeue_stale():
+    """Put jobs whose worker died mid-run back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=TRANSCODE_TIMEOUT)
+    return TranscodeJob.objects.filter(status='running', started_at__lt=cutoff).update(status='queued')
+
+
+def claim_job():
+    """Atomically take the oldest queued job, or return None."""
+    while True:
+        job_id = TranscodeJob.objects.filter(status='queued').order_by('created_at').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        # The status filter makes this a compare-and-swap across workers.
+        claimed = TranscodeJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            return TranscodeJob.objects.select_related('datastore').get(pk=job_id)
+
+
+def probe(source):
+    """{'width', 'height', 'audio'} of a video file, read with ffprobe."""
+    completed = subprocess.run(
+        [FFPROBE_BINARY, '-v', 'error', '-show_entries', 'stream=codec_type,width,height', '-of', 'json', source],
+        check=True, capture_output=True, timeout=60,
+    )
+    streams = json.loads(completed.stdout).get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if video is None or not video.get('height'):
+        raise subprocess.SubprocessError(f"No video stream in {source}")
+    return {
+        'width': video['width'],
+        'height': video['height'],
+        'audio': any(stream.get('codec_type') == 'audio' for stream in streams),
+    }
+
+
+def h264_level(height):
+    for max_height, level, codec in H264_LEVELS:
+        if height <= max_height:
+            return level, codec
+    return '4.2', 'avc1.4d402a'
+
+
+def plan_renditions(source_info):
+    """
+    The ladder rungs worth rendering for a source, as dicts with the actual
+    output size, so the master playlist describes the real streams.
+    """
+    source_height = source_info['height']
+    rungs = [rung for rung in HLS_LADDER if rung[1] <= source_height] or [HLS_LADDER[-1]]
+    renditions = []
+    for name, height, video_kbps, audio_kbps in rungs:
+        height = min(height, source_height)
+        # scale=-2 keeps the aspect ratio with an even width.
+        width = round(source_info['width'] * height / source_height / 2) * 2
+        level, codec = h264_level(height)
+        renditions.append({
+            'name': name, 'width': width, 'height': height, 'video_kbps': video_kbps,
+            'audio_kbps': audio_kbps if source_info['audio'] else 0, 'level': level, 'codec': codec,
+        })
+    return renditions
+
+
+def ffmpeg_rendition_args(source, output, prefix, rendition):
+    video_kbps, audio_kbps = rendition['video_kbps'], rendition['audio_kbps']
+    args = [
+        FFMPEG_BINARY, '-nostdin', '-y', '-loglevel', 'error', '-threads', str(FFMPEG_THREADS),
+        '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f"scale=-2:{rendition['height']}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-level:v', rendition['level'],
+        '-pix_fmt', 'yuv420p',
+        '-b:v', f"{video_kbps}k", '-maxrate', f"{int(video_kbps * HLS_MAXRATE_FACTOR)}k",
+        '-bufsize', f"{video_kbps * 2}k",
+        # A keyframe on every segment boundary, whatever the frame rate.
+        '-force_key_frames', f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})", '-sc_threshold', '0',
+    ]
+    if audio_kbps:
+        args += ['-c:a', 'aac', '-b:a', f"{audio_kbps}k", '-ac', '2']
+    return args + [
+        '-f', 'hls', '-hls_time', str(HLS_SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output, f"{prefix}_{rendition['name']}_%04d.ts"),
+        os.path.join(output, f"{prefix}_{rendition['name']}.m3u8"),
+    ]
+
+
+def ffmpeg_poster_args(source, output):
+    return [
+        FFMPEG_BINARY, '-nostdin', '-y', '-loglevel', 'error', '-i', source,
+        '-vf', "thumbnail,scale=-2:'min(720,ih)'", '-frames:v', '1',
+        os.path.join(output, 'poster.jpg'),
+    ]
+
+
+def playlist_uri(filename):
+    # Files are served as .../hls/<filename>/ (the router appends a slash), so
+    # references must step out of the current "directory" to resolve correctly.
+    return f"../{filename}/"
+
+
+def master_playlist(prefix, renditions):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for rendition in renditions:
+        video_kbps, audio_kbps = rendition['video_kbps'], rendition['audio_kbps']
+        codecs = rendition['codec'] + (f",{AAC_CODEC}" if audio_kbps else '')
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={(int(video_kbps * HLS_MAXRATE_FACTOR) + audio_kbps) * 1000},"
+            f"AVERAGE-BANDWIDTH={(video_kbps + audio_kbps) * 1000},"
+            f"RESOLUTION={rendition['width']}x{rendition['height']},"
+            f"CODECS=\"{codecs}\",NAME=\"{rendition['name']}\""
+        )
+        lines.append(playlist_uri(f"{prefix}_{rendition['name']}.m3u8"))
+    return '\n'.join(lines) + '\n'
+
+
+def rewrite_variant_playlist(path):
+    with open(path) as fh:
+        lines = fh.read().splitlines()
+    lines = [line if not line or line.startswith('#') else playlist_uri(line) for line in lines]
+    with open(path, 'w') as fh:
+        fh.write('\n'.join(lines) + '\n')
+
+
+def transcode(job):
+    """
+    Render the HLS ladder (the rungs the source is tall enough for) and poster
+    for a job into a fresh directory.
+    Files other than master.m3u8 and poster.jpg carry a per-run prefix so they
+    can be cached as immutable.
+    """
+    datastore = job.datastore
+    if datastore.storage_tier == 'cold':
+        tiering.restore(datastore)
+    source = datastore.file.path
+    prefix = uuid.uuid4().hex[:8]
+    relative = os.path.join('hls', str(datastore.pk), prefix)
+    output = os.path.join(settings.MEDIA_ROOT, relative)
+    os.makedirs(output, exist_ok=True)
+
+    try:
+        renditions = plan_renditions(probe(source))
+        commands = [ffmpeg_poster_args(source, output)]
+        commands += [ffmpeg_rendition_args(source, output, prefix, rendition) for rendition in renditions]
+        for args in commands:
+            subprocess.run(args, check=True, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+        for rendition in renditions:
+            rewrite_variant_playlist(os.path.join(output, f"{prefix}_{rendition['name']}.m3u8"))
+        with open(os.path.join(output, 'master.m3u8'), 'w') as fh:
+            fh.write(master_playlist(prefix, renditions))
+    except BaseException:
+        shutil.rmtree(output, ignore_errors=True)
+        raise
+    return relative
+
+
+def run_job(job):
+    try:
+        output_dir = transcode(job)
+    except (OSError, subprocess.SubprocessError) as exc:
+        stderr = getattr(exc, 'stderr', None) or b''
+        message = f"{exc}\n{stderr.decode(errors='replace')[-2000:]}".strip()
+        logger.warning("Transcode of DataStore %s failed: %s", job.datastore_id, message)
+        retry = job.attempts < TRANSCODE_MAX_ATTEMPTS
+        TranscodeJob.objects.filter(pk=job.pk).update(
+            status='queued' if retry else 'failed', error=message, finished_at=timezone.now()
+        )
+        return False
+
+    with transaction.atomic():
+        previous = TranscodeJob.objects.select_for_update().get(pk=job.pk).output_dir
+        # If the file was replaced while we ran, the job is 'queued' again and
+        # this output is already stale.
+        published = TranscodeJob.objects.filter(pk=job.pk, status='running').update(
+            status='done', error='', output_dir=output_dir, finished_at=timezone.now()
+        )
+    stale = previous if published else output_dir
+    if stale:
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, stale), ignore_errors=True)
+    return bool(published)
+
+
+def hls_file_path(job, filename):
+    """Resolve a manifest/segment/poster name inside a finished job's output, or None."""
+    if job.status != 'done' or not job.output_dir or os.sep in filename or filename.startswith('.'):
+        return None
+    path = os.path.join(settings.MEDIA_ROOT, job.output_dir, filename)
+    return path if os.path.isfile(path) else None
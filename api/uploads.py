@@ -0,0 +1,197 @@
+# uploads.py
+import hashlib
+import os
+import struct
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+DATASTORE_MAX_UPLOAD_SIZE = getattr(settings, 'DATASTORE_MAX_UPLOAD_SIZE', 10 * 1024 ** 3)
+# Partial uploads are written here, inside MEDIA_ROOT, so that committing one
+# is a rename on the same filesystem. gc_media reclaims abandoned ones.
+UPLOAD_STAGING_DIR = getattr(settings, 'UPLOAD_STAGING_DIR', os.path.join(settings.MEDIA_ROOT, 'datastore', '.incoming'))
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 1024 * 1024)
+SNIFF_BYTES = 32
+
+# (offset, signature, content type, file_type, format)
+MAGIC_NUMBERS = [
+    (0, b'\xff\xd8\xff', 'image/jpeg', 'photo', 'jpg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png', 'photo', 'png'),
+    (0, b'GIF87a', 'image/gif', 'photo', 'gif'),
+    (0, b'GIF89a', 'image/gif', 'photo', 'gif'),
+    (0, b'\x1a\x45\xdf\xa3', 'video/webm', 'video', 'webm'),
+    (0, b'FLV\x01', 'video/x-flv', 'video', 'flv'),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', 'video/x-ms-wmv', 'video', 'wmv'),
+]
+
+# ISO base media files (MP4, MOV, HEIC, AVIF, M4A, ...) all start with an
+# 'ftyp' box; its major brand says which. (brand prefix, content type,
+# file_type, format); unknown brands are rejected.
+FTYP_BRANDS = [
+    (b'qt  ', 'video/quicktime', 'video', 'mov'),
+    (b'iso', 'video/mp4', 'video', 'mp4'),
+    (b'mp4', 'video/mp4', 'video', 'mp4'),
+    (b'avc1', 'video/mp4', 'video', 'mp4'),
+    (b'M4V', 'video/x-m4v', 'video', 'mp4'),
+    (b'heic', 'image/heic', 'photo', 'heic'),
+    (b'heix', 'image/heic', 'photo', 'heic'),
+    (b'heim', 'image/heic', 'photo', 'heic'),
+    (b'heis', 'image/heic', 'photo', 'heic'),
+    (b'mif1', 'image/heif', 'photo', 'heic'),
+    (b'avif', 'image/avif', 'photo', 'avif'),
+]
+
+
+# RIFF containers: 'RIFF', the chunk size, then the form type.
+RIFF_FORMS = {
+    b'WEBP': ('image/webp', 'photo', 'webp'),
+    b'AVI ': ('video/x-msvideo', 'video', 'avi'),
+}
+
+# BMP: 'BM', file size, two reserved words, pixel data offset, then the DIB
+# header, whose size identifies its version (core, info, v2-v5, OS/2 2.x).
+BMP_HEADER = struct.Struct('<2sIHHII')
+BMP_DIB_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+BMP = ('image/bmp', 'photo', 'bmp')
+
+
+def bmp_declared_size(head):
+    """The file size a BMP header declares, or None if it is not a BMP header."""
+    if len(head) < BMP_HEADER.size or head[:2] != b'BM':
+        return None
+    _, size, _, _, pixel_offset, dib_size = BMP_HEADER.unpack_from(head)
+    if dib_size not in BMP_DIB_HEADER_SIZES or not 14 + dib_size <= pixel_offset <= size:
+        return None
+    return size
+
+
+def sniff(head):
+    """(content type, file_type, format) from the first bytes of a file, or None."""
+    if head[:4] == b'RIFF':
+        return RIFF_FORMS.get(head[8:12])
+    if bmp_declared_size(head) is not None:
+        return BMP
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        for prefix, content_type, file_type, file_format in FTYP_BRANDS:
+            if brand.startswith(prefix):
+                return content_type, file_type, file_format
+        return None
+    for offset, signature, content_type, file_type, file_format in MAGIC_NUMBERS:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type, file_type, file_format
+    return None
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class StreamedUploadedFile(UploadedFile):
+    """
+    An upload already sitting on the media filesystem. FileSystemStorage moves
+    anything with ``temporary_file_path()`` into place with os.rename, so saving
+    it commits the upload without copying a byte.
+    """
+
+    def __init__(self, file, name, content_type, size, charset, content_type_extra, sha256, detected):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = sha256
+        self.detected = detected
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        # Still here means it was never saved: drop the partial file.
+        try:
+            return self.file.close()
+        finally:
+            try:
+                os.remove(self.file.name)
+            except FileNotFoundError:
+                pass
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Single-pass upload handler: each chunk is written once, next to its final
+    location, while the SHA-256 is computed, the type is sniffed from the magic
+    bytes and the size limit is enforced. Rejections stop reading the body and
+    are recorded on the request as ``upload_error`` (an UploadRejected).
+    """
+
+    chunk_size = UPLOAD_CHUNK_SIZE
+
+    def __init__(self, request=None, max_size=DATASTORE_MAX_UPLOAD_SIZE):
+        super().__init__(request)
+        self.max_size = max_size
+        self.file = None
+
+    def reject(self, message, status_code):
+        self.request.upload_error = UploadRejected(message, status_code)
+        self.discard()
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > self.max_size + 64 * 1024:
+            # Multipart overhead aside, the body cannot fit under the limit;
+            # refuse it without reading a byte.
+            self.request.upload_error = UploadRejected(
+                f"Upload exceeds the {self.max_size} byte limit.", 413
+            )
+            return QueryDict(), MultiValueDict()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        os.makedirs(UPLOAD_STAGING_DIR, exist_ok=True)
+        path = os.path.join(UPLOAD_STAGING_DIR, f"{uuid.uuid4().hex}.part")
+        self.file = open(path, 'xb+')
+        self.sha256 = hashlib.sha256()
+        self.head = b''
+        self.detected = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.reject(f"Upload exceeds the {self.max_size} byte limit.", 413)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.detected = sniff(self.head)
+                if self.detected is None:
+                    self.reject("Unsupported file type; upload a photo or video.", 415)
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.detected is None:
+            self.detected = sniff(self.head)
+        if self.detected is None or (self.detected is BMP and bmp_declared_size(self.head) != file_size):
+            self.reject("Unsupported file type; upload a photo or video.", 415)
+        self.file.flush()
+        # The rename that commits the upload is only atomic for data on disk.
+        os.fsync(self.file.fileno())
+        self.file.seek(0)
+        uploaded = StreamedUploadedFile(
+            self.file, self.file_name, self.detected[0], file_size, self.charset,
+            self.content_type_extra, self.sha256.hexdigest(), self.detected,
+        )
+        return uploaded
+
+    def discard(self):
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+            try:
+                os.remove(self.file.name)
+            except FileNotFoundError:
+                pass
+
+    def upload_interrupted(self):
+        self.discard()
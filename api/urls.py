@@ -1,7 +1,11 @@
 # urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import * 
+from .views import (
+    BatchAPIView, CrmViewSet, DataStoreViewSet, EventViewSet, InvoiceViewSet, PasswordResetConfirmAPIView,
+    PasswordResetRequestAPIView, SharedAPIView, SyncAPIView, UserLoginAPIView, UserRegistrationAPIView,
+    UserViewSet, WebhookViewSet,
+)
     
 
 router = DefaultRouter()
@@ -9,6 +13,8 @@ router.register(r'users', UserViewSet, basename='user')
 router.register(r'crm',CrmViewSet,basename='crm')
 router.register(r'invoices', InvoiceViewSet, basename='invoice')
 router.register(r'datastore', DataStoreViewSet, basename='datastore')
+router.register(r'webhooks', WebhookViewSet, basename='webhook')
+router.register(r'events', EventViewSet, basename='event')
 
 
 urlpatterns = [
@@ -16,5 +22,8 @@ urlpatterns = [
     path('login/', UserLoginAPIView.as_view(), name='login'),
     path('password-reset/', PasswordResetRequestAPIView.as_view(), name='password-reset'),
     path('password-reset-confirm/', PasswordResetConfirmAPIView.as_view(), name='password-reset-confirm'),
+    path('sync/', SyncAPIView.as_view(), name='sync'),
+    path('shared/<str:token>/', SharedAPIView.as_view(), name='shared'),
+    path('batch/', BatchAPIView.as_view(), name='batch'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,21 +1,47 @@
 # views.py
-from rest_framework import status, viewsets
+import mimetypes
+import os
+import secrets
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractWeekDay
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from rest_framework import mixins, status, viewsets
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.authtoken.models import Token
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import *
-from .serializers import *
-  
+
+from . import batch, phash, purge, sharing, tiering, transcoding
+from .avatars import schedule_avatar_processing
+from .events import record_event, settled_events
+from .models import Crm, DataStore, Invoice, OutboxEvent, PhotoHash, Tombstone, TranscodeJob, User, Webhook
+from .readplans import ReadPlan
+from .serializers import (
+    BatchRequestSerializer, CrmSerializer, DataStoreSerializer, InvoiceSerializer, OutboxEventSerializer,
+    PasswordResetConfirmSerializer, PasswordResetRequestSerializer, ShareRequestSerializer, UserLoginSerializer,
+    UserRegistrationSerializer, UserSerializer, WebhookSerializer,
+)
+from .throttling import (
+    AuthEmailThrottle, AuthIPThrottle, LoginBackoffThrottle,
+    register_login_failure, reset_login_failures,
+)
+from .uploads import StreamingUploadHandler
+
 
 class UserRegistrationAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthIPThrottle]
     
     def post(self, request):
         serializer = UserRegistrationSerializer(data=request.data)
@@ -31,10 +57,13 @@ class UserRegistrationAPIView(APIView):
 
 class UserLoginAPIView(APIView):
     permission_classes = [AllowAny]
+    # Checked in order before post() runs, so rejected attempts skip hashing.
+    throttle_classes = [LoginBackoffThrottle, AuthIPThrottle, AuthEmailThrottle]
     
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
+            reset_login_failures(request)
             user = serializer.validated_data['user']
             token, created = Token.objects.get_or_create(user=user)
             return Response({
@@ -42,16 +71,22 @@ class UserLoginAPIView(APIView):
                 'token': token.key,
                 'user': UserSerializer(user).data
             }, status=status.HTTP_200_OK)
+        register_login_failure(request)
         return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
 
 class PasswordResetRequestAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [AuthIPThrottle, AuthEmailThrottle]
     
     def post(self, request):
         serializer = PasswordResetRequestSerializer(data=request.data)
         if serializer.is_valid():
             email = serializer.validated_data['email']
             try:
+                # smtplib and the email package are only needed here; keep
+                # them out of worker start-up.
+                from django.core.mail import send_mail
+
                 user = User.objects.get(email=email)
                 token = default_token_generator.make_token(user)
                 uid = urlsafe_base64_encode(force_bytes(user.pk))
@@ -109,7 +144,8 @@ class PasswordResetConfirmAPIView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-from rest_framework import viewsets, mixins
+
+USER_PAYLOAD_CACHE_TIMEOUT = getattr(settings, 'USER_PAYLOAD_CACHE_TIMEOUT', 3600)
 
 
 class UserViewSet(mixins.RetrieveModelMixin,
@@ -122,12 +158,30 @@ class UserViewSet(mixins.RetrieveModelMixin,
         # Always return the authenticated user
         return self.request.user
 
+    def retrieve(self, request, *args, **kwargs):
+        # request.user is already loaded by token authentication, so a cache
+        # hit answers without touching the database or the serializer.
+        user = self.get_object()
+        key = f"user-payload:{user.pk}:{user.updated_at.timestamp()}:{request.scheme}://{request.get_host()}"
+        data = cache.get(key)
+        if data is None:
+            data = self.get_serializer(user).data
+            cache.set(key, data, USER_PAYLOAD_CACHE_TIMEOUT)
+        return Response(data)
+
+    def perform_update(self, serializer):
+        photo_changed = 'profile_photo' in serializer.validated_data
+        if photo_changed:
+            # The replaced photo and its renditions are no longer referenced
+            # by anything; new renditions get new names.
+            purge.schedule_blob_removal(purge.user_blob_names(serializer.instance))
+            # Old renditions no longer match the new photo.
+            user = serializer.save(avatar_renditions={})
+        else:
+            user = serializer.save()
+        if photo_changed and user.profile_photo:
+            schedule_avatar_processing(user.pk)
 
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from django.db.models.functions import ExtractWeekDay
-from django.db.models import Count
-import calendar
 
 class CrmViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -136,8 +190,20 @@ class CrmViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Crm.objects.filter(user=self.request.user)
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        crm = serializer.save(user=self.request.user)
+        record_event(self.request.user, 'crm.created', crm, serializer.data)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        crm = serializer.save()
+        record_event(self.request.user, 'crm.updated', crm, serializer.data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        record_event(self.request.user, 'crm.deleted', instance)
+        instance.delete()
 
     @action(detail=False, methods=["get"])
     def status_by_day(self, request):
@@ -166,27 +232,37 @@ class CrmViewSet(viewsets.ModelViewSet):
                 result[day_name][status] = entry["count"]
 
         return Response(result)
-       
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
-from .models import Invoice, ServiceItem
-from .serializers import InvoiceSerializer
-from django.db.models import Q
-from django.db.models import Sum
+
 
 class InvoiceViewSet(viewsets.ModelViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    read_plan = ReadPlan(InvoiceSerializer)
     
     def get_queryset(self):
         user = self.request.user
         return Invoice.objects.filter(created_by=user)
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(self.read_plan.serialize(queryset, self.get_serializer_context()))
     
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        invoice = serializer.save(created_by=self.request.user)
+        record_event(self.request.user, 'invoice.created', invoice, serializer.data)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        invoice = serializer.save()
+        record_event(self.request.user, 'invoice.updated', invoice, serializer.data)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        record_event(self.request.user, 'invoice.deleted', instance)
+        instance.delete()
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -198,15 +274,19 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_as_paid(self, request, pk=None):
         invoice = self.get_object()
-        invoice.status = 'paid'
-        invoice.save()
+        with transaction.atomic():
+            invoice.status = 'paid'
+            invoice.save()
+            record_event(request.user, 'invoice.paid', invoice, self.get_serializer(invoice).data)
         return Response({'status': 'invoice marked as paid'})
     
     @action(detail=True, methods=['post'])
     def mark_as_sent(self, request, pk=None):
         invoice = self.get_object()
-        invoice.status = 'sent'
-        invoice.save()
+        with transaction.atomic():
+            invoice.status = 'sent'
+            invoice.save()
+            record_event(request.user, 'invoice.sent', invoice, self.get_serializer(invoice).data)
         return Response({'status': 'invoice marked as sent'})
     
     @action(detail=False, methods=['get'])
@@ -237,36 +317,137 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status__in=['draft', 'sent']
             ).count()
         })
-    
-
-
-
 
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
-from .models import DataStore
-from .serializers import DataStoreSerializer
-from django.contrib.auth import get_user_model
 
-User = get_user_model()
+HLS_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.jpg': 'image/jpeg',
+}
 
 class DataStoreViewSet(viewsets.ModelViewSet):
     serializer_class = DataStoreSerializer
     permission_classes = [IsAuthenticated]
+    read_plan = ReadPlan(DataStoreSerializer)
+    streaming_uploads = getattr(settings, 'DATASTORE_STREAMING_UPLOADS', True)
     
     def get_queryset(self):
         # Return only files belonging to the authenticated user
-        return DataStore.objects.filter(user=self.request.user)
+        return DataStore.objects.filter(user=self.request.user).select_related('transcode_job')
+
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if self.streaming_uploads and self.action in ('create', 'update', 'partial_update'):
+            # Must be set before the body is parsed, i.e. before request.data.
+            request.upload_handlers = [StreamingUploadHandler(request)]
+        return drf_request
+
+    def upload_rejection(self, request):
+        request.data  # parse the body
+        error = getattr(request._request, 'upload_error', None)
+        if error is not None:
+            return Response({'error': error.message}, status=error.status_code)
+        return None
+
+    def upload_fields(self, upload):
+        # What the streaming handler learned while the bytes went by; saves
+        # DataStore.save() from guessing by extension or re-reading the file.
+        if not hasattr(upload, 'sha256'):
+            return {}
+        content_type, file_type, file_format = upload.detected
+        return {'file_type': file_type, 'file_format': file_format, 'size': upload.size, 'checksum': upload.sha256}
     
+    @transaction.atomic
     def perform_create(self, serializer):
         # Automatically set the user to the current authenticated user
-        serializer.save(user=self.request.user)
+        # Hash the upload while it is still in hand rather than re-reading it
+        # from storage afterwards.
+        upload = serializer.validated_data.get('file')
+        value = phash.hash_file(upload) if upload else None
+        instance = serializer.save(user=self.request.user, **self.upload_fields(upload))
+        if instance.file_type == 'video':
+            transcoding.enqueue(instance)
+        elif instance.file_type == 'photo' and value is not None:
+            phash.save_hash(instance, value)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        upload = serializer.validated_data.get('file')
+        if upload is None:
+            serializer.save()
+            return
+        # The replacement lands in hot storage; drop the original from
+        # whichever tier held it once the update commits.
+        hot, cold, _ = purge.blob_names(serializer.instance)
+        purge.schedule_blob_removal(hot, cold)
+        serializer.instance.storage_tier, serializer.instance.cold_name = 'hot', ''
+        value = phash.hash_file(upload)
+        instance = serializer.save(**self.upload_fields(upload))
+        # Whatever was derived from the old file goes with it.
+        if instance.file_type == 'video':
+            transcoding.enqueue(instance)
+        else:
+            jobs = TranscodeJob.objects.filter(datastore=instance)
+            purge.schedule_blob_removal(hls=jobs.exclude(output_dir='').values_list('output_dir', flat=True))
+            jobs.delete()
+        if instance.file_type == 'photo' and value is not None:
+            phash.save_hash(instance, value)
+        else:
+            PhotoHash.objects.filter(datastore=instance).delete()
+        # get_queryset's select_related cached the old file's job; the
+        # response must show the new state.
+        relation = DataStore._meta.get_field('transcode_job')
+        if relation.is_cached(instance):
+            relation.delete_cached_value(instance)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Photos within ``?distance=`` bits (default 8) of this one's perceptual hash."""
+        instance = self.get_object()
+        distance = self.hash_distance(request)
+        if distance is None:
+            return Response({'error': f'distance must be an integer between 0 and {phash.MAX_DISTANCE}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        stored = PhotoHash.objects.filter(datastore=instance).values_list('hash', flat=True).first()
+        if stored is None:
+            return Response({'error': 'This file has no perceptual hash.'}, status=status.HTTP_404_NOT_FOUND)
+
+        matches = phash.find_similar(request.user, phash.to_unsigned(stored), distance, exclude=instance.pk)
+        distances = dict(matches)
+        rows = self.read_plan.serialize(self.get_queryset().filter(pk__in=distances), self.get_serializer_context())
+        for row in rows:
+            row['distance'] = distances[row['id']]
+        rows.sort(key=lambda row: (row['distance'], row['id']))
+        return Response(rows)
+
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """Groups of near-duplicate photos (bursts, re-exports) in the user's library."""
+        distance = self.hash_distance(request)
+        if distance is None:
+            return Response({'error': f'distance must be an integer between 0 and {phash.MAX_DISTANCE}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        hashes = PhotoHash.objects.filter(user=request.user).values_list('datastore_id', 'hash')
+        index = phash.MultiIndexHash((key, phash.to_unsigned(value)) for key, value in hashes)
+        groups = index.duplicate_groups(distance)
+
+        ids = [key for group in groups for key in group]
+        rows = self.read_plan.serialize(self.get_queryset().filter(pk__in=ids), self.get_serializer_context())
+        by_id = {row['id']: row for row in rows}
+        return Response([[by_id[key] for key in group if key in by_id] for group in groups])
+
+    def hash_distance(self, request):
+        try:
+            distance = int(request.query_params.get('distance', phash.DEFAULT_DISTANCE))
+        except ValueError:
+            return None
+        return distance if 0 <= distance <= phash.MAX_DISTANCE else None
     
     def create(self, request, *args, **kwargs):
         # Handle file upload
+        rejection = self.upload_rejection(request)
+        if rejection is not None:
+            return rejection
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -276,15 +457,106 @@ class DataStoreViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def photos(self, request):
         photos = self.get_queryset().filter(file_type='photo')
-        serializer = self.get_serializer(photos, many=True)
-        return Response(serializer.data)
+        return Response(self.read_plan.serialize(photos, self.get_serializer_context()))
     
     @action(detail=False, methods=['get'])
     def videos(self, request):
         videos = self.get_queryset().filter(file_type='video')
-        serializer = self.get_serializer(videos, many=True)
-        return Response(serializer.data)
+        return Response(self.read_plan.serialize(videos, self.get_serializer_context()))
     
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        tiering.record_access(instance.pk)
+        if instance.storage_tier == 'cold' and getattr(settings, 'TIERING_RESTORE_ON_READ', True):
+            # Lazy restore: the file URL in the payload must resolve.
+            tiering.restore(instance)
+        return Response(self.get_serializer(instance).data)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Stream the file from whichever tier holds it, without restoring it."""
+        instance = self.get_object()
+        if not instance.file:
+            return Response({'error': 'No file stored.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            blob = tiering.open_blob(instance)
+        except FileNotFoundError:
+            return Response({'error': 'File not found.'}, status=status.HTTP_404_NOT_FOUND)
+        tiering.record_access(instance.pk)
+        filename = instance.name or os.path.basename(instance.file.name)
+        content_type = mimetypes.guess_type(instance.file.name)[0] or 'application/octet-stream'
+        return FileResponse(blob, as_attachment=True, filename=filename, content_type=content_type)
+
+    @action(detail=True, methods=['get'], url_path=r'hls/(?P<filename>[\w.-]+)')
+    def hls(self, request, pk=None, filename=None):
+        """
+        Serve the HLS output of a transcoded video: master.m3u8, poster.jpg and
+        the variant playlists/segments the master references.
+        """
+        instance = self.get_object()
+        job = getattr(instance, 'transcode_job', None)
+        path = transcoding.hls_file_path(job, filename) if job else None
+        if path is None:
+            return Response({'error': 'Stream not available.'}, status=status.HTTP_404_NOT_FOUND)
+        tiering.record_access(instance.pk)
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if filename in ('master.m3u8', 'poster.jpg'):
+            # Stable names: revalidate so a re-transcode is picked up.
+            cache_control = 'private, no-cache'
+        else:
+            # Per-run names: the content behind them never changes.
+            cache_control = 'private, max-age=31536000, immutable'
+
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            content_type = HLS_CONTENT_TYPES.get(os.path.splitext(filename)[1], 'application/octet-stream')
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+    
+    @action(detail=True, methods=['post'])
+    def share(self, request, pk=None):
+        """Signed, expiring public link to this file."""
+        instance = self.get_object()
+        params = ShareRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        expires = sharing.expiry(params.validated_data.get('expires_in'))
+        return self.share_response(request, sharing.file_token(instance, expires), expires)
+
+    @action(detail=False, methods=['post'], url_path='share')
+    def share_set(self, request):
+        """Signed, expiring public link to the files matching the posted filters."""
+        params = ShareRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        filters = {
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in params.validated_data.items() if key != 'expires_in'
+        }
+        expires = sharing.expiry(params.validated_data.get('expires_in'))
+        return self.share_response(request, sharing.set_token(request.user, filters, expires), expires)
+
+    @action(detail=False, methods=['post'])
+    def revoke_shares(self, request):
+        """Invalidate every share link handed out so far."""
+        sharing.revoke(request.user)
+        return Response({'status': 'share links revoked'})
+
+    def share_response(self, request, token, expires):
+        return Response({
+            'url': sharing.share_url(request, token),
+            'expires_at': datetime.fromtimestamp(expires, tz=dt_timezone.utc),
+        }, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        rejection = self.upload_rejection(request)
+        if rejection is not None:
+            return rejection
+        return super().update(request, *args, **kwargs)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         
@@ -295,10 +567,222 @@ class DataStoreViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Delete the actual file from storage
-        instance.file.delete()
+        # Hide the record now; its files and the row itself are purged in the
+        # background.
+        purge.soft_delete(instance)
         
-        # Delete the database record
-        self.perform_destroy(instance)
-        
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class WebhookViewSet(viewsets.ModelViewSet):
+    serializer_class = WebhookSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Webhook.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        # New endpoints only receive events recorded after registration.
+        last = OutboxEvent.objects.filter(user=self.request.user).order_by('-id').first()
+        serializer.save(
+            user=self.request.user,
+            secret=secrets.token_hex(32),
+            last_event_id=last.id if last else 0,
+        )
+
+
+class EventViewSet(viewsets.GenericViewSet):
+    serializer_class = OutboxEventSerializer
+    permission_classes = [IsAuthenticated]
+    max_page_size = 500
+
+    def list(self, request):
+        # Change feed: clients pass back the highest id they have seen.
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', self.max_page_size)), self.max_page_size)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = list(settled_events(request.user.id, since)[:limit])
+        return Response({
+            'events': self.get_serializer(events, many=True).data,
+            'next': events[-1].id if events else since,
+            'has_more': len(events) == limit,
+        })
+
+
+class SyncAPIView(APIView):
+    """
+    Delta sync for offline clients. Pass the ``token`` returned by the previous
+    call to receive only rows changed or deleted since then.
+
+    Responses are paged: while ``has_more`` is true, the token resumes the
+    same pass (rows in ``updated_at, id`` order, one model after another) and
+    ``deleted`` is empty; the last page carries the deletions and the token
+    for the next delta.
+    """
+    permission_classes = [IsAuthenticated]
+    token_salt = 'api.sync'
+    # The next token is moved back by this much so that rows committed by
+    # transactions still in flight during this sync are picked up next time.
+    overlap = timedelta(seconds=getattr(settings, 'SYNC_OVERLAP_SECONDS', 2))
+    tombstone_days = getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90)
+    page_size = getattr(settings, 'SYNC_PAGE_SIZE', 500)
+    # (response key, model, owner field, read plan), in paging order.
+    sections = [
+        ('crm', Crm, 'user', ReadPlan(CrmSerializer)),
+        ('invoices', Invoice, 'created_by', ReadPlan(InvoiceSerializer)),
+        ('datastore', DataStore, 'user', ReadPlan(DataStoreSerializer)),
+    ]
+
+    def read_token(self, token, now):
+        """
+        The pass a token asks for, as {'since', 'until', 'section', 'cursor'}.
+        A delta token (the timestamp the last pass ended at) starts a new
+        pass up to ``now``; a page token continues one.
+        """
+        value = signing.loads(token, salt=self.token_salt)
+        if not isinstance(value, dict):
+            since = datetime.fromtimestamp(value, tz=dt_timezone.utc)
+            return {'since': since, 'until': now, 'section': 0, 'cursor': None}
+        cursor = value['c']
+        return {
+            'since': datetime.fromisoformat(value['s']) if value['s'] else None,
+            'until': datetime.fromisoformat(value['u']),
+            'section': int(value['p']),
+            'cursor': (datetime.fromisoformat(cursor[0]), int(cursor[1])) if cursor else None,
+        }
+
+    def page_token(self, state, section, cursor):
+        return signing.dumps({
+            's': state['since'].isoformat() if state['since'] else None,
+            'u': state['until'].isoformat(),
+            'p': section,
+            'c': [cursor[0].isoformat(), cursor[1]] if cursor else None,
+        }, salt=self.token_salt)
+
+    def get(self, request):
+        now = timezone.now()
+        state = {'since': None, 'until': now, 'section': 0, 'cursor': None}
+        token = request.query_params.get('token')
+        if token:
+            try:
+                state = self.read_token(token, now)
+            except (signing.BadSignature, KeyError, IndexError, TypeError, ValueError, OverflowError):
+                return Response({'error': 'Invalid sync token.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.page_size)), self.page_size)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be at least 1.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Tombstones older than the retention window may have been pruned.
+        since = state['since']
+        reset = since is not None and since < now - timedelta(days=self.tombstone_days)
+        if reset:
+            state = {'since': None, 'until': now, 'section': 0, 'cursor': None}
+            since = None
+
+        user = request.user
+        context = {'request': request}
+        data = {key: [] for key, *_ in self.sections}
+        section, cursor, remaining = state['section'], state['cursor'], limit
+        while section < len(self.sections) and remaining:
+            key, model, owner, plan = self.sections[section]
+            rows = model.objects.filter(**{owner: user}, updated_at__lte=state['until'])
+            if since is not None:
+                rows = rows.filter(updated_at__gt=since)
+            if cursor is not None:
+                rows = rows.filter(Q(updated_at__gt=cursor[0]) | Q(updated_at=cursor[0], pk__gt=cursor[1]))
+            # One row more than fits tells whether this section continues.
+            keys = list(rows.order_by('updated_at', 'pk').values_list('pk', 'updated_at')[:remaining + 1])
+            page = keys[:remaining]
+            if page:
+                data[key] = plan.serialize(
+                    model.objects.filter(pk__in=[pk for pk, _ in page]).order_by('updated_at', 'pk'), context,
+                )
+            remaining -= len(page)
+            if len(keys) > len(page):
+                cursor = (page[-1][1], page[-1][0])
+                break
+            section, cursor = section + 1, None
+
+        has_more = section < len(self.sections)
+        deleted = {'crm': [], 'invoice': [], 'datastore': []}
+        if has_more:
+            next_token = self.page_token(state, section, cursor)
+        else:
+            next_token = signing.dumps((state['until'] - self.overlap).timestamp(), salt=self.token_salt)
+            if since is not None:
+                tombstones = Tombstone.objects.filter(
+                    user=user, deleted_at__gt=since, deleted_at__lte=state['until'],
+                ).values_list('model_name', 'object_id')
+                for model_name, object_id in tombstones:
+                    deleted[model_name].append(object_id)
+
+        return Response({
+            'token': next_token,
+            'has_more': has_more,
+            'reset': reset,
+            **data,
+            'deleted': deleted,
+        })
+
+
+class BatchAPIView(APIView):
+    """
+    Several API calls in one round trip: the batch is authenticated once and
+    each entry is dispatched through the URLconf as its own request, with the
+    results returned in order, each with its own status code.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = batch.run(
+            request, serializer.validated_data['requests'],
+            parallel=serializer.validated_data['parallel'], excluded_views=(BatchAPIView,),
+        )
+        return Response({'responses': results})
+
+
+class SharedAPIView(APIView):
+    """
+    Public endpoint behind share links. Everything needed to serve a file is in
+    the signed token; the only query is the owner's key version, checked so
+    revoked links stop working. Responses are publicly cacheable until the
+    link expires (capped at SHARE_CACHE_MAX_AGE).
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        try:
+            payload = sharing.verify(token)
+        except sharing.ShareError as exc:
+            return Response({'error': exc.message}, status=exc.status_code)
+
+        if payload['k'] == 's':
+            response = Response(sharing.set_manifest(request, token, payload))
+        else:
+            etag = f'"{payload["h"]}"' if payload['h'] else None
+            if etag is not None and request.headers.get('If-None-Match') == etag:
+                response = HttpResponseNotModified()
+            else:
+                try:
+                    blob = tiering.open_by_name(payload['n'])
+                except FileNotFoundError:
+                    return Response({'error': 'File not found.'}, status=status.HTTP_404_NOT_FOUND)
+                tiering.record_access(payload['i'])
+                content_type = mimetypes.guess_type(payload['n'])[0] or 'application/octet-stream'
+                response = FileResponse(blob, filename=payload['d'], content_type=content_type)
+            if etag is not None:
+                response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={sharing.cache_max_age(payload)}"
+        return response
@@ -0,0 +1,43 @@
+# warmup.py
+import importlib
+import logging
+import mimetypes
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+WARMUP_IMPORTS = getattr(settings, 'WARMUP_IMPORTS', [])
+
+
+def warm_up(imports=None):
+    """
+    Do the lazy first-request work up front: import every view and serializer,
+    compile read plans, load the mimetypes table and any extra modules listed in
+    WARMUP_IMPORTS. Meant for a preforking master (gunicorn ``preload_app``),
+    where it runs once and workers inherit the result copy-on-write.
+    """
+    get_resolver().url_patterns
+
+    from .urls import router
+
+    for prefix, viewset, basename in router.registry:
+        read_plan = getattr(viewset, 'read_plan', None)
+        if read_plan is not None:
+            read_plan.compile()
+        serializer_class = getattr(viewset, 'serializer_class', None)
+        if serializer_class is not None:
+            # Populates the model _meta caches the serializers introspect.
+            serializer_class().fields
+
+    mimetypes.init()
+    for name in WARMUP_IMPORTS if imports is None else imports:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Warm-up could not import %s", name)
+
+    # Connections opened above must not be shared with forked workers.
+    connections.close_all()
@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+# gunicorn -c backend/gunicorn.conf.py
+import multiprocessing
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings_api')
+
+wsgi_app = 'backend.wsgi:application'
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Load Django once in the master; new workers fork from it instead of
+# importing everything themselves.
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before any
+    # worker is forked.
+    from api.warmup import warm_up
+
+    warm_up()
+    server.log.info("Application warmed up")
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from importlib.util import find_spec
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -130,13 +132,58 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        # Entries of an /api/batch/ call run as the already authenticated batch.
+        'api.batch.BatchAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': '30/min',
+        'auth_email': '10/min',
+    },
+    # Reverse proxies in front of the app. Throttles and login lockouts key on
+    # the client IP; with 0 that is REMOTE_ADDR and X-Forwarded-For (which any
+    # client can forge) is ignored. Behind N trusted proxies set this to N.
+    'NUM_PROXIES': 0,
 }
 
+# MessagePack is offered only when the optional msgpack package is installed.
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'api.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(1, 'api.renderers.MessagePackParser')
+
+# Throttle counters must be shared by all workers in production; point this at
+# Redis or Memcached there. LocMemCache is per-process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Failed logins allowed per email from one IP before exponential backoff kicks in.
+LOGIN_FREE_FAILURES = 5
+LOGIN_MAX_LOCKOUT = 15 * 60
+
+# Responses smaller than this are sent uncompressed.
+COMPRESSION_MIN_SIZE = 1024
+
+# DataStore blobs untouched for TIERING_IDLE_DAYS are moved here by
+# `manage.py tier_datastore`; point it at cheaper/archival storage.
+COLD_STORAGE_ROOT = os.path.join(BASE_DIR, 'cold_media')
+COLD_STORAGE_COMPRESS = False
+TIERING_IDLE_DAYS = 180
+
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
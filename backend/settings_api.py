@@ -0,0 +1,49 @@
+"""
+API-only settings profile for production workers.
+
+Token authentication means the API never needs the admin, sessions, messages
+or the browsable API; dropping them shortens worker start-up and the
+per-request middleware chain. Use with
+DJANGO_SETTINGS_MODULE=backend.settings_api and run the admin, if needed,
+from a separate process on the default settings.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+DROPPED_APPS = {
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DROPPED_APPS]
+
+DROPPED_MIDDLEWARE = {
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    # request.user is resolved by DRF's TokenAuthentication instead.
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Token-authenticated requests are not subject to CSRF.
+    'django.middleware.csrf.CsrfViewMiddleware',
+}
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in DROPPED_MIDDLEWARE]
+
+TEMPLATES[0]['OPTIONS']['context_processors'] = [
+    'django.template.context_processors.request',
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ],
+}
+
+# Modules imported by api.warmup.warm_up() in a preforking master so that
+# workers share them copy-on-write instead of importing them on first use.
+WARMUP_IMPORTS = [
+    'django.core.mail',
+    'PIL.Image',
+    'PIL.ImageOps',
+]